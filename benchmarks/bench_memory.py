@@ -0,0 +1,62 @@
+"""Measures memory held by a transaction pool and by a range of blocks kept in memory.
+
+Usage:
+    PYTHONPATH=./ python benchmarks/bench_memory.py [num_transactions] [num_blocks]
+"""
+import base64
+import os
+import sys
+import tracemalloc
+
+from ccoin.messages import Transaction, Block
+from ccoin.transaction_queue import TransactionQueue
+
+TXNS_PER_BLOCK = 10
+
+
+def make_transaction(nonce):
+    # address-referenced sender and random signature of RSA-1024 size, signing is not measured here
+    sender = os.urandom(20).hex()
+    txn = Transaction(nonce, sender, to=os.urandom(20).hex(), amount=1, data="bench", time=1.0,
+                      signature=base64.b64encode(os.urandom(128)).decode())
+    txn.generate_id()
+    return txn
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, after - before
+
+
+def build_mempool(count):
+    q = TransactionQueue()
+    for nonce in range(count):
+        q.add_transaction(make_transaction(nonce))
+    return q
+
+
+def build_blocks(count):
+    blocks = []
+    for number in range(count):
+        txns = [make_transaction(nonce) for nonce in range(TXNS_PER_BLOCK)]
+        blk = Block(number + 2, os.urandom(32).hex(), txns, coinbase=os.urandom(20).hex(),
+                    hash_state=os.urandom(32).hex(), id=os.urandom(32).hex(), time=1.0)
+        blocks.append(blk)
+    return blocks
+
+
+def main(num_transactions=100000, num_blocks=10000):
+    _, mempool_bytes = measure(lambda: build_mempool(num_transactions))
+    print("mempool of %s transactions: %.1f MB, %.0f bytes/txn" % (
+        num_transactions, mempool_bytes / 1e6, mempool_bytes / num_transactions))
+    _, blocks_bytes = measure(lambda: build_blocks(num_blocks))
+    print("%s blocks of %s transactions: %.1f MB, %.0f bytes/block" % (
+        num_blocks, TXNS_PER_BLOCK, blocks_bytes / 1e6, blocks_bytes / num_blocks))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,58 @@
+"""Measures transaction pool operations performed on every new chain head and on block building.
+
+Usage:
+    PYTHONPATH=./ python benchmarks/bench_mempool.py [num_transactions] [block_size]
+"""
+import itertools
+import sys
+import time
+from copy import deepcopy
+
+from ccoin.messages import Transaction
+from ccoin.transaction_queue import TransactionQueue
+
+
+def make_transactions(count):
+    txns = []
+    for nonce in range(count):
+        sender = "%040x" % (nonce % 1000)
+        txn = Transaction(nonce // 1000, sender, to=sender, amount=1, data=str(nonce))
+        txn.generate_id()
+        txns.append(txn)
+    return txns
+
+
+def main(count=100000, block_size=100):
+    txns = make_transactions(count)
+    q = TransactionQueue()
+    started = time.perf_counter()
+    for txn in txns:
+        q.add_transaction(txn)
+    add_elapsed = time.perf_counter() - started
+    print("add: %.1f us/txn" % (add_elapsed / count * 1e6))
+
+    state_nonces = {}
+    for txn in txns:
+        state_nonces.setdefault(txn.sender_address, txn.nonce - 1)
+    started = time.perf_counter()
+    taken = list(itertools.islice(deepcopy(q).iter_ready(state_nonces.get), block_size))
+    copy_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    taken = list(itertools.islice(q.snapshot().iter_ready(state_nonces.get), block_size))
+    snapshot_elapsed = time.perf_counter() - started
+    print("take %s ready transactions: deepcopy %.1f ms, snapshot %.1f ms" % (
+        len(taken), copy_elapsed * 1e3, snapshot_elapsed * 1e3))
+
+    blocks = [txns[i:i + block_size] for i in range(0, count, block_size)]
+    timings = []
+    for block in blocks:
+        started = time.perf_counter()
+        q.diff(block)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print("new head with %s transactions in mempool of %s: median %.3f ms, max %.3f ms" % (
+        block_size, count, timings[len(timings) // 2] * 1e3, timings[-1] * 1e3))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
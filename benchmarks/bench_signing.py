@@ -0,0 +1,43 @@
+"""Measures per-transaction signing latency.
+
+Usage:
+    PYTHONPATH=./ python benchmarks/bench_signing.py [num_transactions]
+"""
+import sys
+import time
+
+from ccoin.messages import Transaction
+from ccoin.security import generate_key_pair, load_private_key
+
+
+def make_transactions(public_key, count):
+    txns = []
+    for nonce in range(count):
+        txn = Transaction(nonce, public_key, to=public_key, amount=1, data="bench")
+        txn.generate_id()
+        txns.append(txn)
+    return txns
+
+
+def measure(private_key, txns):
+    started = time.perf_counter()
+    for txn in txns:
+        txn.signature = None
+        txn.sign(private_key)
+    return (time.perf_counter() - started) / len(txns)
+
+
+def main(count=1000):
+    private_hex, public_hex = generate_key_pair()
+    private_key = load_private_key(private_hex)
+    txns = make_transactions(public_hex, count)
+    hex_latency = measure(private_hex, txns)
+    key_latency = measure(private_key, txns)
+    print("transactions signed: %s" % count)
+    print("hex-encoded private key: %.1f us/txn" % (hex_latency * 1e6))
+    print("parsed private key:      %.1f us/txn" % (key_latency * 1e6))
+    print("speedup: %.2fx" % (hex_latency / key_latency))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
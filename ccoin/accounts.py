@@ -1,5 +1,5 @@
 from ccoin.app_conf import AppConfig
-from ccoin.security import generate_key_pair
+from ccoin.security import generate_key_pair, load_private_key, detect_signature_scheme, DEFAULT_SIGNATURE_SCHEME
 from ccoin.utils import ensure_dir
 
 
@@ -28,7 +28,10 @@ class Account(object):
 
     def __init__(self, public_key):
         self.public_key = public_key
-        self.address = self.public_key[115:155]
+        # signature scheme is recognized by the public key format
+        signature_scheme = detect_signature_scheme(public_key)
+        self.scheme = signature_scheme.name
+        self.address = signature_scheme.address(public_key)
         self.private_key = None
         self.nonce = -1
 
@@ -50,9 +53,10 @@ class Account(object):
         self.nonce += val
 
     def load_private_key(self):
+        """Loads and parses private key once, so that signing does not have to parse PEM on each call."""
         if not self.private_key and AppConfig["key_dir"]:
             with open(self.private_key_path(), 'r') as fh:
-                self.private_key = fh.read()
+                self.private_key = load_private_key(fh.read().strip(), scheme=self.scheme)
         return self.private_key
 
     def store_keys(self, private_key):
@@ -65,8 +69,8 @@ class Account(object):
                 fh.write(self.public_key)
 
     @classmethod
-    def create(cls):
-        private_key_hex, public_key_hex = generate_key_pair()
+    def create(cls, scheme=DEFAULT_SIGNATURE_SCHEME):
+        private_key_hex, public_key_hex = generate_key_pair(scheme=scheme)
         account = cls(public_key_hex)
         account.store_keys(private_key_hex)
         return account
\ No newline at end of file
@@ -0,0 +1,116 @@
+import time
+
+from twisted.internet import reactor
+from twisted.python import log
+
+from ccoin.messages import decode_message
+from ccoin.metrics import metrics
+
+
+class TransactionAdmission(object):
+    """Admits incoming transactions in batches instead of one by one.
+
+    Serialized transactions are accumulated for `window` seconds after the first one arrives or until `max_batch`
+    of them are pending, whichever comes first. Batch is then deserialized, deduplicated by transaction content and
+    handed over to the handler, which verifies signatures of the whole batch in parallel and inserts it into
+    the queue at once. Transactions accepted by the handler are reported with their senders to `on_accepted`.
+
+    Attributes:
+        pending (list[tuple]): serialized transactions waiting for the batch with their senders
+        first_received (float): arrival time of the oldest pending transaction
+        delayed_flush (twisted.internet.interfaces.IDelayedCall): scheduled flush of the batch
+    """
+
+    def __init__(self, handler, window, max_batch, clock=reactor, on_accepted=None):
+        """
+        :param handler: admits the batch, called with list of transactions, returns accepted transactions
+        :type handler: callable
+        :param window: max seconds transaction waits for the batch
+        :type window: float
+        :param max_batch: number of pending transactions which flushes the batch immediately
+        :type max_batch: int
+        :param clock: provider of delayed calls
+        :type clock: twisted.internet.interfaces.IReactorTime
+        :param on_accepted: called with accepted transaction and list of its senders
+        :type on_accepted: callable
+        """
+        self.handler = handler
+        self.on_accepted = on_accepted
+        self.window = window
+        self.max_batch = max_batch
+        self.clock = clock
+        self.pending = []
+        self.first_received = None
+        self.delayed_flush = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def submit(self, msg, sender=None):
+        """
+        Adds serialized transaction to the batch.
+        :param msg: serialized transaction
+        :type msg: bytes
+        :param sender: connection of the peer which sent the transaction
+        :type sender: ccoin.p2p_network.BasePeerConnection
+        """
+        if not self.pending:
+            self.first_received = time.time()
+        self.pending.append((msg, sender))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.delayed_flush is None:
+            self.delayed_flush = self.clock.callLater(self.window, self.flush)
+
+    def cancel(self):
+        if self.delayed_flush is not None:
+            if self.delayed_flush.active():
+                self.delayed_flush.cancel()
+            self.delayed_flush = None
+
+    @staticmethod
+    def dedup_key(txn):
+        # transactions sharing id but differing in content aren't duplicates, invalid one mustn't shadow the other
+        return txn.id, txn.signature, txn.signing_digest()
+
+    def flush(self):
+        """
+        Admits pending transactions.
+        :return: number of admitted transactions
+        :rtype: int
+        """
+        self.cancel()
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, []
+        started = time.time()
+        txns = {}
+        senders = {}
+        for msg, sender in batch:
+            try:
+                txn = decode_message(msg)
+            except Exception:
+                metrics.incr("admission.malformed")
+                log.err()
+                continue
+            key = self.dedup_key(txn)
+            senders.setdefault(key, []).append(sender)
+            if key in txns:
+                metrics.incr("admission.duplicates")
+                continue
+            txns[key] = txn
+        try:
+            accepted = self.handler(list(txns.values())) or []
+        except Exception:
+            accepted = []
+            log.err()
+        if self.on_accepted is not None:
+            for txn in accepted:
+                self.on_accepted(txn, senders.get(self.dedup_key(txn), []))
+        finished = time.time()
+        metrics.incr("admission.batches")
+        metrics.incr("admission.transactions", len(batch))
+        metrics.observe("admission.batch_processing", finished - started)
+        # including the time the oldest transaction waited for the batch
+        metrics.observe("admission.batch_latency", finished - self.first_received)
+        return len(txns)
@@ -9,11 +9,64 @@ AppConfig = LazyDict({
     "key_dir": os.path.join("{storage_path}", ".keys"),
     "chain_db": "blockchain",
     "state_db": "worldstate",
+    "mempool_journal": "mempool.journal",
     "discovery_service": {
         "host": "192.168.0.1",
         "port": 8000,
         "proto": "http"
     },
+    "signature_verify_workers": 4,
+    "signature_cache_size": 100000,
+    "mempool": {
+        "max_transactions": 100000,
+        "max_bytes": 256 * 1024 * 1024,
+        "max_per_sender": 256,
+        "ttl": 3 * 60 * 60  # seconds
+    },
+    "seen_cache": {
+        "max_size": 100000,
+        "ttl": 10 * 60,  # seconds
+        "bloom_bits": 0  # Bloom filter in front of the cache is disabled
+    },
+    "admission": {
+        "enabled": True,
+        "window": 0.05,  # seconds incoming transaction waits for the batch
+        "max_batch": 512
+    },
+    "inventory": {
+        "enabled": True,
+        "announce_delay": 0.05,  # seconds announcements are accumulated for before INV is sent
+        "known_size": 50000,  # inventory remembered per peer
+        "relay_store_size": 10000,  # announced messages and received transactions kept to serve GDT requests
+        "request_timeout": 5,  # seconds announced inventory isn't requested again from other peers
+        "ttl": 10 * 60  # seconds
+    },
+    "outbound": {
+        # bytes queued per priority class once peer's transport is full, peer is disconnected once any class
+        # is over the limit
+        "max_bytes": {
+            "control": 1024 * 1024,
+            "blocks": 32 * 1024 * 1024,
+            "transactions": 4 * 1024 * 1024
+        }
+    },
+    "compact_blocks": {
+        "enabled": True,
+        "max_pending": 16  # blocks waiting for missing transactions at once
+    },
+    "sync": {
+        "window": 64,  # blocks requested at once
+        "max_in_flight": 2,  # windows requested from a peer at once
+        "timeout": 10,  # seconds
+        "max_retries": 3,  # failed requests peer is dropped after
+        "headers_first": True,  # validate header chain before downloading blocks
+        "header_batch": 2000  # headers requested at once
+    },
+    "compression": {
+        "enabled": True,
+        "threshold": 4096,  # bytes, smaller messages are sent uncompressed
+        "level": 6
+    },
     "pj": os.path.join
 })
 
@@ -90,7 +90,7 @@ class DeferredRequestMixin(object):
 
         # Send request over the wire
         connection = self.get_connection(addr)
-        connection.sendString(msg.serialize())
+        connection.send_message(msg)
         # Finalize
         self.request_registry[req_id] = d
         self.cnt += 1
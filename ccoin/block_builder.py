@@ -0,0 +1,128 @@
+import time
+
+from twisted.python import log
+
+from ccoin.exceptions import TransactionApplyException
+
+
+class CandidateBlockBuilder(object):
+    """Keeps candidate block of the next block number and its speculative state up to date with the transaction
+    queue, so that the block is ready to be mined once it's needed.
+
+    Candidate is started from ready transactions of the queue snapshot, afterwards each newly queued transaction is applied
+    once as it arrives, together with sender's queued transactions it makes ready. Block holds at most `max_bound`
+    transactions of genesis block config, the rest wait in the queue for the next block.
+
+    Transactions are verified when they are queued, so they are applied without verification, and the speculative
+    state is committed once, when the candidate is taken.
+
+    Attributes:
+        block (ccoin.messages.Block): candidate block, None until it's started or once it's taken
+        state (ccoin.worldstate.WorldState): speculative state of the candidate block
+        txns (list[ccoin.messages.Transaction]): transactions applied to the candidate block
+        failed_senders (set[str]): senders whose transaction failed to apply, their following transactions
+            are skipped to keep sender's nonces contiguous
+    """
+
+    def __init__(self, worldstate, chain, coinbase):
+        """
+        :param worldstate: state of the chain head
+        :type worldstate: ccoin.worldstate.WorldState
+        :param chain: chain
+        :type chain: ccoin.blockchain.Blockchain
+        :param coinbase: address of the miner to reward
+        :type coinbase: str
+        """
+        self.worldstate = worldstate
+        self.chain = chain
+        self.coinbase = coinbase
+        self.block = None
+        self.state = None
+        self.txns = []
+        self.failed_senders = set()
+
+    def __len__(self):
+        return len(self.txns)
+
+    @property
+    def started(self):
+        return self.block is not None
+
+    @property
+    def is_full(self):
+        return len(self.txns) >= self.chain.genesis_block.max_tx_bound
+
+    def invalidate(self):
+        """Drops the candidate, e.g. once chain head has changed."""
+        self.block = None
+        self.state = None
+        self.txns = []
+        self.failed_senders = set()
+
+    def start(self, txqueue):
+        """
+        Starts new candidate block on top of the chain head from ready transactions of the queue.
+        :param txqueue: transaction queue
+        :type txqueue: ccoin.transaction_queue.TransactionQueue
+        """
+        self.invalidate()
+        self.block = self.chain.create_candidate_block(coinbase=self.coinbase)
+        self.state = self.worldstate.new_candidate_block_state(self.block)
+        # the queue isn't copied, snapshot makes sure it isn't changed while it's iterated
+        for txn in txqueue.snapshot().iter_ready(self.state.account_nonce):
+            if self.is_full:
+                break
+            self.apply(txn)
+        log.msg("Started candidate block=%s with %s transactions" % (self.block.number, len(self.txns)))
+
+    def apply(self, txn):
+        sender_address = txn.sender_address
+        if sender_address in self.failed_senders:
+            return False
+        try:
+            self.state.apply_txn(txn, verify=False, commit=False)
+        except TransactionApplyException:
+            self.failed_senders.add(sender_address)
+            log.err()
+            return False
+        self.txns.append(txn)
+        return True
+
+    def add_transactions(self, txqueue, txns):
+        """
+        Applies newly queued transactions which are ready and sender's queued transactions they make ready.
+        Candidate block is started if it isn't yet.
+        :param txqueue: transaction queue
+        :type txqueue: ccoin.transaction_queue.TransactionQueue
+        :param txns: transactions just added to the queue
+        :type txns: list[ccoin.messages.Transaction]
+        """
+        if not self.started:
+            # the queue holds new transactions already
+            self.start(txqueue)
+            return
+        for sender_address in dict.fromkeys(txn.sender_address for txn in txns):
+            while not self.is_full and sender_address not in self.failed_senders:
+                nonce = self.state.account_nonce(sender_address)
+                if nonce is None:
+                    break
+                txn = txqueue.next_transaction(sender_address, nonce)
+                if txn is None or not self.apply(txn):
+                    break
+
+    def take(self):
+        """
+        Finalizes the candidate block with transactions and coinbase reward and hands it over, next candidate is
+        started from the queue.
+        :return: tuple of <candidate_block, candidate_state>
+        :rtype: tuple[ccoin.messages.Block, ccoin.worldstate.WorldState]
+        """
+        block, state = self.block, self.state
+        block.set_transactions(self.txns, txns_root_version=self.chain.genesis_block.txns_root_version)
+        state.incr_balance(block.coinbase, block.reward)
+        block.hash_state = state.commit()
+        # candidate may have been started long before, the block is timestamped once it's taken
+        block.time = time.time()
+        log.msg("Candidate Block hash state %s" % block.hash_state)
+        self.invalidate()
+        return block, state
@@ -66,7 +66,7 @@ class Blockchain(object):
             return key
         return ("blk-%s" % key).encode()
 
-    def __init__(self, db, genesis_block, height, head, new_head_cb=None):
+    def __init__(self, db, genesis_block, height, head, new_head_cb=None, rollback_cb=None):
         """
         :param db: blockchain database connection
         :type db: plyvel.DB
@@ -78,12 +78,15 @@ class Blockchain(object):
         :type head: Block
         :param new_head_cb: callback executed once head is changed
         :type new_head_cb: callable
+        :param rollback_cb: callback executed with block number once block failed to apply and its state is cleared
+        :type rollback_cb: callable
         """
         self.db = db
         self.genesis_block = genesis_block
         self.height = height
         self.head = head
         self.new_head_cb = new_head_cb
+        self.rollback_cb = rollback_cb
 
     def initialized(self):
         return self.genesis_block is not None
@@ -99,11 +102,20 @@ class Blockchain(object):
         :param blk_number:
         :return:
         """
-        blk_bytes = self.db.get(self.to_key(blk_number))
+        blk_bytes = self.get_block_bytes(blk_number)
         if blk_bytes is None:
             return
         return Block.deserialize(blk_bytes)
 
+    def get_block_bytes(self, blk_number):
+        """
+        Loads serialized block by block number from database.
+        :param blk_number:
+        :return: serialized block or None
+        :rtype: bytes
+        """
+        return self.db.get(self.to_key(blk_number))
+
     def apply_blocks(self, blocks, worldstate):
         """
         :param blocks:
@@ -120,6 +132,37 @@ class Blockchain(object):
         elif isinstance(block, Block):
             self.apply_next_block(block, worldstate)
 
+    def validate_header(self, block, parent, genesis_block=None):
+        """
+        Validates block header against its parent, so that header chain is validated without block bodies.
+        :param block: block or its header
+        :type block: ccoin.messages.Block
+        :param parent: parent block or its header, None if block is genesis block
+        :type parent: ccoin.messages.Block
+        :param genesis_block: genesis block of the chain, defaults to the genesis block of this chain
+        :type genesis_block: ccoin.messages.GenesisBlock
+        :raises: BlockApplyException
+        """
+        if parent is None:
+            if block.number != settings.GENESIS_BLOCK_NUMBER:
+                raise BlockWrongNumber(block)
+        else:
+            genesis_block = genesis_block or self.genesis_block
+            # 1. Check if the previous block referenced exists and is valid.
+            if parent.id != block.hash_parent:
+                raise BlockChainViolated(block)
+            # 2. Check that the timestamp of the block is greater than that of the referenced previous block
+            if block.time <= parent.time:
+                raise BlockTimeError(block)
+            # 3. Check that the block number and difficulty are valid.
+            if genesis_block.mine_difficulty != block.difficulty:
+                raise BlockWrongDifficulty(block)
+            if block.number != parent.number + 1:
+                raise BlockWrongNumber(block)
+        # 4. Check that the proof of work on the block is valid.
+        if not verify_pow(block.difficulty, block.mining_hash, block.nonce, block.id):
+            raise BlockPoWFailed(block)
+
     def apply_next_block(self, block, worldstate):
         """
         :param block:
@@ -128,24 +171,13 @@ class Blockchain(object):
         :return:
         :raises: BlockApplyException
         """
-        # 1. Check if the previous block referenced exists and is valid.
+        # 1-4. Check that the block follows the head and its proof of work is valid.
         if self.head.id != block.hash_parent:
             print(self.head.id, block.hash_parent, self.head.number, block.number)
-            raise BlockChainViolated(block)
-        # 2. Check that the timestamp of the block is greater than that of the referenced previous block
-        if block.time <= self.head.time:
-            raise BlockTimeError(block)
-        # 3. Check that the block number, difficulty, transaction root are valid.
-        if self.genesis_block.mine_difficulty != block.difficulty:
-            raise BlockWrongDifficulty(block)
-        if block.number != self.head.number + 1:
-            raise BlockWrongNumber(block)
-        # 4. Check that transaction root is valid
-        if block.get_transactions_hash() != block.hash_txns:
+        self.validate_header(block, self.head)
+        # 5. Check that transaction root is valid
+        if block.body.calc_hash(self.genesis_block.txns_root_version) != block.hash_txns:
             raise BlockWrongTransactionHash(block)
-        # 5. Check that the proof of work on the block is valid.
-        if not verify_pow(block.difficulty, block.mining_hash, block.nonce, block.id):
-            raise BlockPoWFailed(block)
         # 5. Let S[0] be the state at the end of the previous block.
         prev_block_height = self.new_block(worldstate, block)
         try:
@@ -174,7 +206,7 @@ class Blockchain(object):
         if genesis_block is None or genesis_block.number != 1:
             raise BlockApplyException(self.genesis_block)
         # 4. Check that transaction root is valid
-        if genesis_block.get_transactions_hash() != genesis_block.hash_txns:
+        if genesis_block.body.calc_hash(genesis_block.txns_root_version) != genesis_block.hash_txns:
             raise BlockWrongTransactionHash(genesis_block)
         # 5. Check that the proof of work on the block is valid.
         if not verify_pow(genesis_block.difficulty, genesis_block.mining_hash, genesis_block.nonce, genesis_block.id):
@@ -205,7 +237,10 @@ class Blockchain(object):
         """
         self.db.delete(self.to_key(self.height))
         self.change_head(prev_block_height)
-        return worldstate.rollback_block(prev_block_height)
+        invalid_block_height = worldstate.rollback_block(prev_block_height)
+        if self.rollback_cb:
+            self.rollback_cb(invalid_block_height)
+        return invalid_block_height
 
     def new_block(self, worldstate, block):
         """
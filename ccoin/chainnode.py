@@ -1,6 +1,7 @@
+import itertools
 from abc import abstractstaticmethod
+from collections import OrderedDict
 
-from copy import deepcopy
 from twisted.internet import defer, reactor
 from twisted.internet.task import LoopingCall
 from twisted.python import log
@@ -9,15 +10,24 @@ from ccoin import settings
 from ccoin.accounts import Account
 from ccoin.app_conf import AppConfig
 from ccoin.blockchain import Blockchain
-from ccoin.common import make_candidate_block, generate_block_data
+from ccoin.block_builder import CandidateBlockBuilder
+from ccoin.common import generate_block_data
+from ccoin.compact_block import PartialBlock
+from ccoin.compression import compression_ratio
 from ccoin.exceptions import AccountDoesNotExist, TransactionApplyException, BlockApplyException
+from ccoin.inventory import inventory_key
+from ccoin.mempool_journal import MempoolJournal
 from ccoin.messages import RequestBlockHeight, ResponseBlockHeight, RequestBlockList, ResponseBlockList, GenesisBlock, \
-    LeaderRequestMessage, LeaderResponseMessage
-from ccoin.p2p_network import BasePeer
+    LeaderRequestMessage, LeaderResponseMessage, Transaction, ResponseBlockHeaders, Block, GetDataMessage, \
+    GetBlockTransactionsMessage, BlockTransactionsMessage
+from ccoin.metrics import metrics
+from ccoin.p2p_network import BasePeer, BasePeerConnection
 from ccoin.pow import Miner
+from ccoin.security import verify_many
+from ccoin.sync import BlockSync, HeaderSync, FEATURE_HEADERS
 from ccoin.transaction_queue import TransactionQueue
 from ccoin.utils import ts
-from ccoin.worldstate import WorldState
+from ccoin.worldstate import WorldState, PendingState
 
 
 class DeferredRequestPool(object):
@@ -62,6 +72,9 @@ class ChainNode(BasePeer):
     # TODO for that we need to reflect current account's nonce
     # TODO 3. transaction pool should sort by nonce and addresses
 
+    # serialized blocks per response, leaves room for the envelope within frame size limit
+    MAX_BLOCK_LIST_BYTES = BasePeerConnection.MAX_LENGTH * 9 // 10
+
     @staticmethod
     def identifier():
         return "basic"
@@ -92,6 +105,8 @@ class ChainNode(BasePeer):
         :type state: WorldState
         :ivar chain: Blockchain reference
         :type chain: Blockchain
+        :ivar partial_blocks: compact blocks waiting for missing transactions by block id
+        :type partial_blocks: OrderedDict
         """
         super(ChainNode, self).__init__(address)
         self.account = None
@@ -99,6 +114,8 @@ class ChainNode(BasePeer):
         self.state = None  # world state
         self.chain = None
         self.drp = DeferredRequestPool()
+        self.block_sync = None
+        self.partial_blocks = OrderedDict()
 
     @property
     def genesis_block(self):
@@ -137,14 +154,14 @@ class ChainNode(BasePeer):
             rebh = ResponseBlockHeight(self.chain.height,
                                        self.id,
                                        request_id=request_block.request_id)
-            sender.sendString(rebh.serialize())
+            sender.send_message(rebh)
 
     def broadcast_request_block_height(self):
         rbh = RequestBlockHeight(self.chain.height, self.id)
         return self.broadcast_request(rbh, raise_on_timeout=True)
 
-    def request_blocks(self, addr, start_from=settings.GENESIS_BLOCK_NUMBER):
-        rbl = RequestBlockList(start_from, addr)
+    def request_blocks(self, addr, start_from=settings.GENESIS_BLOCK_NUMBER, count=None):
+        rbl = RequestBlockList(start_from, addr, count=count)
         return self.send_request(addr, rbl, raise_on_timeout=True)
 
     def receive_block_height_response(self, response_block, sender):
@@ -160,16 +177,64 @@ class ChainNode(BasePeer):
         if request_blocks.start_from_block > self.chain.height:
             # No blocks to provide
             msg = ResponseBlockList([], self.id, request_id=request_blocks.request_id)
-            sender.sendString(msg.serialize())
+            sender.send_message(msg)
         else:
+            last_number = self.chain.height
+            if request_blocks.count:
+                last_number = min(last_number, request_blocks.start_from_block + request_blocks.count - 1)
             blocks = []
-            for blk_number in range(request_blocks.start_from_block, self.chain.height + 1):
-                blk = self.chain.get_block(blk_number)
-                if blk is None:
+            size = 0
+            for blk_number in range(request_blocks.start_from_block, last_number + 1):
+                # stored blocks are sent without decoding
+                blk_bytes = self.chain.get_block_bytes(blk_number)
+                if blk_bytes is None:
+                    break
+                size += len(blk_bytes)
+                if blocks and size > self.MAX_BLOCK_LIST_BYTES:
+                    # the rest is requested again
                     break
-                blocks.append(blk)
+                blocks.append(blk_bytes)
             msg = ResponseBlockList(blocks, self.id, request_id=request_blocks.request_id)
-            sender.sendString(msg.serialize())
+            sender.send_message(msg)
+
+    def receive_request_headers(self, request_headers, sender):
+        """
+        :param request_headers:
+        :type request_headers: RequestBlockHeaders
+        :param sender:
+        :return:
+        """
+        last_number = self.chain.height
+        if request_headers.count:
+            last_number = min(last_number, request_headers.start_from_block + request_headers.count - 1)
+        headers = []
+        size = 0
+        for blk_number in range(request_headers.start_from_block, last_number + 1):
+            blk = self.chain.get_block(blk_number)
+            if blk is None:
+                break
+            header_bytes = blk.header().serialize(sender.wire_format)
+            size += len(header_bytes)
+            if headers and size > self.MAX_BLOCK_LIST_BYTES:
+                # the rest is requested again
+                break
+            headers.append(header_bytes)
+        msg = ResponseBlockHeaders(headers, self.id, request_id=request_headers.request_id)
+        sender.send_message(msg)
+
+    def receive_response_headers(self, response_headers, sender):
+        """
+        :param response_headers:
+        :type response_headers: ResponseBlockHeaders
+        :param sender:
+        :return:
+        """
+        d = self.request_registry.get(response_headers.request_id)
+        if d is not None and d.called:
+            # response came after the request timed out
+            self.request_registry.pop(response_headers.request_id)
+            return
+        self.receive_response(response_headers)
 
     def receive_response_blocks(self, response_blocks, sender):
         """
@@ -179,11 +244,21 @@ class ChainNode(BasePeer):
         :return:
         """
         log.msg("Downloaded %s blocks." % len(response_blocks.blocks))
+        d = self.request_registry.get(response_blocks.request_id)
+        if d is not None:
+            if d.called:
+                # response came after the request timed out
+                self.request_registry.pop(response_blocks.request_id)
+            else:
+                self.receive_response(response_blocks)
+            return
         log.msg("Applying blocks")
-        for blk in response_blocks.blocks:
+        for lazy_blk in response_blocks.blocks:
             try:
+                blk = lazy_blk.message
                 self.receive_block(blk)
-            except BlockApplyException as ex:
+            except Exception as ex:
+                # malformed or mistyped block embedded by the peer as well
                 log.msg(str(ex))
                 log.err(ex)
                 break
@@ -208,15 +283,28 @@ class ChainNode(BasePeer):
             self.account.set_nonce(account_state.nonce)
 
     def receive_transaction(self, transaction):
-        try:
-            transaction.verify()
-        except TransactionApplyException:
-            log.msg("Transaction with id=%s failed to verify." % transaction.id)
-            log.err()
-            return False
-        else:
-            log.msg("Transaction with id=%s verified successfully." % transaction.id)
-            return True
+        return bool(self.receive_transactions([transaction]))
+
+    def receive_transactions(self, transactions):
+        """
+        Verifies burst of incoming transactions in parallel. Verified transactions are kept in the relay store,
+        so that compact blocks are reconstructed from them and peers can request them.
+        :param transactions: list of incoming transactions
+        :type transactions: list[ccoin.messages.Transaction]
+        :return: transactions that passed verification
+        :rtype: list[ccoin.messages.Transaction]
+        """
+        verified = []
+        self.state.resolve_sender_keys(transactions)
+        for transaction, error in zip(transactions, verify_many(transactions)):
+            if error is not None:
+                log.msg("Transaction with id=%s failed to verify." % transaction.id)
+                log.err(error)
+            else:
+                log.msg("Transaction with id=%s verified successfully." % transaction.id)
+                self.relay_store.add(transaction)
+                verified.append(transaction)
+        return verified
 
     @defer.inlineCallbacks
     def on_bootstrap_network_ok(self):
@@ -231,37 +319,139 @@ class ChainNode(BasePeer):
         # # request blocks
         log.msg("Network bootstrap successfully accomplished. Ready for the next tasks")
         block_results = yield self.broadcast_request_block_height()
-        max_height = -1
-        best_result = None
+        heights = {}
         for success, value in block_results:
             if not success:
                 continue
             msg = value
-            if msg.block_number > max_height:
-                max_height = msg.block_number
-                best_result = msg
-        if not best_result:
+            if msg.block_number > self.chain.height:
+                heights[msg.address] = msg.block_number
+        if not heights:
             log.msg("Nobody has block higher than mine")
             self.change_fsm_state(ns.READY_STATE)
             return
         # request blocks
-        cur_block_height = self.chain.height
-        log.msg("Found max block = %s from peer = %s" % (best_result.block_number, best_result.address))
-        log.msg("Start downloading from = %s" % best_result.address)
+        log.msg("Found max block = %s from %s peers" % (max(heights.values()), len(heights)))
+        sync_conf = AppConfig["sync"]
+        headers = None
+        header_peers = {address: height for address, height in heights.items()
+                        if FEATURE_HEADERS in self.peers_connection[address].features}
+        if sync_conf["headers_first"] and header_peers:
+            header_sync = HeaderSync(self, header_peers, batch=sync_conf["header_batch"], timeout=sync_conf["timeout"])
+            headers = yield header_sync.start()
+            # bodies are downloaded from peers which reported the validated chain only
+            height = header_sync.height
+            heights = {address: min(peer_height, height) for address, peer_height in heights.items()
+                       if address not in header_sync.bad_peers and peer_height >= height}
+            if height <= self.chain.height or not heights:
+                log.msg("No valid chain higher than mine")
+                self.change_fsm_state(ns.READY_STATE)
+                return
+        self.block_sync = BlockSync(self, heights,
+                                    window=sync_conf["window"],
+                                    max_in_flight=sync_conf["max_in_flight"],
+                                    timeout=sync_conf["timeout"],
+                                    max_retries=sync_conf["max_retries"],
+                                    headers=headers)
         try:
-            blocks = yield self.request_blocks(best_result.address, start_from=self.chain.height + 1)
-            log.msg("Downloaded %s blocks" % len(blocks))
-        except defer.TimeoutError:
-            log.msg("Timeout to download blocks")
+            yield self.block_sync.start()
+        finally:
+            self.block_sync = None
         self.change_fsm_state(ns.READY_STATE)
 
     def receive_block(self, block):
+        """
+        :param block:
+        :type block: ccoin.messages.Block
+        :return: whether block is applied
+        :rtype: bool
+        """
         try:
             self.chain.apply_block(block, worldstate=self.state)
         except BlockApplyException as ex:
             log.msg(str(ex))
             # TODO move errors to err.log
             log.err(ex)
+            return False
+        return True
+
+    def compact_block_transactions(self):
+        """
+        :return: transactions compact blocks are reconstructed from
+        :rtype: collections.Iterable[ccoin.messages.Transaction]
+        """
+        return self.relay_store.messages_of(Transaction.identifier)
+
+    def receive_compact_block(self, compact_block, sender):
+        """
+        Reconstructs block from transactions the node has, requests missing ones from the sender.
+        :param compact_block:
+        :type compact_block: CompactBlockMessage
+        :param sender:
+        :type sender: BasePeerConnection
+        """
+        key = inventory_key(Block.identifier, compact_block.id)
+        sender.mark_known(key)
+        if key in self.seen_messages or compact_block.id in self.partial_blocks:
+            metrics.incr("compact_blocks.duplicates")
+            return
+        metrics.incr("compact_blocks.received")
+        partial = PartialBlock(compact_block, sender)
+        partial.fill(self.compact_block_transactions())
+        if partial.is_complete:
+            self.complete_compact_block(partial)
+            return
+        missing = partial.missing
+        metrics.incr("compact_blocks.missing_transactions", len(missing))
+        self.partial_blocks[partial.id] = partial
+        while len(self.partial_blocks) > AppConfig["compact_blocks"]["max_pending"]:
+            self.partial_blocks.popitem(last=False)
+        sender.send_message(GetBlockTransactionsMessage(partial.id, missing, self.id))
+
+    def receive_get_block_transactions(self, request, sender):
+        """
+        :param request:
+        :type request: GetBlockTransactionsMessage
+        :param sender:
+        :type sender: BasePeerConnection
+        """
+        block = self.find_inventory(Block.identifier, request.block_id)
+        if block is None or not all(0 <= index < len(block.body) for index in request.indexes):
+            metrics.incr("compact_blocks.unknown_requests")
+            return
+        txns = [block.body.txns[index] for index in request.indexes]
+        sender.send_message(BlockTransactionsMessage(request.block_id, request.indexes, txns, self.id))
+
+    def receive_block_transactions(self, response, sender):
+        """
+        :param response:
+        :type response: BlockTransactionsMessage
+        :param sender:
+        :type sender: BasePeerConnection
+        """
+        partial = self.partial_blocks.get(response.block_id)
+        if partial is None:
+            return
+        if not partial.add(response.indexes, response.txns) or not partial.is_complete:
+            self.request_full_block(partial)
+            return
+        self.complete_compact_block(partial)
+
+    def complete_compact_block(self, partial):
+        self.partial_blocks.pop(partial.id, None)
+        block = partial.to_block()
+        if block.body.calc_hash(self.genesis_block.txns_root_version) != block.hash_txns:
+            # short ids collided with another transaction
+            self.request_full_block(partial)
+            return
+        metrics.incr("compact_blocks.reconstructed")
+        if self.receive_block(block):
+            self.remember_gossip(inventory_key(Block.identifier, block.id))
+
+    def request_full_block(self, partial):
+        self.partial_blocks.pop(partial.id, None)
+        metrics.incr("compact_blocks.fallbacks")
+        partial.sender.send_message(GetDataMessage([[Block.identifier, partial.id]], self.id))
 
     def get_block_info(self, block_number):
         block = self.chain.get_block(block_number)
@@ -274,6 +464,17 @@ class ChainNode(BasePeer):
     def get_block_count(self):
         return self.chain.height
 
+    def get_metrics(self):
+        """
+        :return: node counters and timings
+        :rtype: dict
+        """
+        data = metrics.to_dict()
+        data["compression_ratio"] = compression_ratio()
+        if self.block_sync is not None:
+            data["sync"] = self.block_sync.progress()
+        return data
+
     def get_txn_info(self, txn_id, block_number=None):
         if block_number is None:
             block_number = self.chain.height
@@ -284,23 +485,72 @@ class ChainNode(BasePeer):
             if txn.id == txn_id:
                 return txn
 
+    def get_account_nonce(self, account_addr):
+        """
+        :param account_addr: account address
+        :type account_addr: str
+        :return: account's nonce in the world state and once its pending transactions are applied,
+            None if account doesn't exist
+        :rtype: dict | None
+        """
+        nonce = self.state.account_nonce(account_addr)
+        if nonce is None:
+            return
+        return {
+            "address": account_addr,
+            "nonce": nonce,
+            "pending_nonce": nonce,
+        }
+
+    def get_txn_proof(self, txn_id, block_number):
+        """
+        Builds Merkle inclusion proof of transaction in the block.
+        :param txn_id: transaction id
+        :type txn_id: str
+        :param block_number: number of the block including transaction
+        :type block_number: int
+        :return: proof details, None if block doesn't include transaction or chain doesn't use Merkle root
+        :rtype: dict | None
+        """
+        if self.chain.genesis_block.txns_root_version != settings.TXNS_ROOT_MERKLE:
+            return
+        block = self.chain.get_block(block_number)
+        if block is None or not block.body:
+            return
+        proof = block.body.calc_proof(txn_id)
+        if proof is None:
+            return
+        return {
+            "txn_id": txn_id,
+            "block_number": block.number,
+            "block_id": block.id,
+            "hash_txns": block.hash_txns,
+            "proof": proof,
+        }
+
     def make_transfer_txn(self, sendto_address, amount, data=None):
         """
-        Creates spendable transaction.
-        :param sendto_address: public key of recipient
+        Creates spendable transaction. Sender is referenced by address once its public key is registered
+        by a block with enough confirmations.
+        :param sendto_address: address or public key of recipient
         :param amount: amount of money sender is wishing to spend
         :return:
         :rtype: ccoin.messages.Transaction
         """
-        return self.make_txn(self.account.public_key, sendto_address, amount=amount, data=data)
+        from_ = self.account.public_key
+        confirmed_height = self.chain.height - settings.KEY_REGISTRATION_CONFIRMATIONS
+        if confirmed_height >= settings.GENESIS_BLOCK_NUMBER and \
+                self.state.public_key(self.account.address, block_number=confirmed_height) is not None:
+            from_ = self.account.address
+        return self.make_txn(from_, sendto_address, amount=amount, data=data)
 
     def make_txn(self, from_, to, data=None, amount=None):
         """
         :param command: command details
         :type command: str
-        :param from_: sender public key
+        :param from_: sender public key or address
         :type from_: str
-        :param to: recipient public key
+        :param to: recipient public key or address
         :param amount: amount of money to send to
         :return: transaction reference
         :rtype: Transaction
@@ -308,7 +558,10 @@ class ChainNode(BasePeer):
         self.account.increment_nonce()
         if data is None:
             data = generate_block_data(self.genesis_block.txn_placeholder_config)
-        txn = self.state.make_txn(from_, to, data=data, amount=amount, nonce=self.account.nonce)
+        txn = self.state.make_txn(from_, to, data=data, amount=amount, nonce=self.account.nonce,
+                                  scheme=self.account.scheme)
+        if txn.sender_is_address:
+            txn.set_sender_public_key(self.account.public_key)
         return txn
 
     def relay_txn(self, transaction):
@@ -338,11 +591,18 @@ class MinerNode(ChainNode):
 
     def __init__(self, address, **kwargs):
         super().__init__(address, **kwargs)
-        self.txqueue = TransactionQueue()
+        mempool = AppConfig["mempool"]
+        self.txqueue = TransactionQueue(max_transactions=mempool["max_transactions"],
+                                        max_bytes=mempool["max_bytes"],
+                                        max_per_sender=mempool["max_per_sender"],
+                                        ttl=mempool["ttl"])
+        self.mempool_journal = None
         self.can_mine = kwargs.get("can_mine", False)
         self.ready_mine_new_block = kwargs.get("ready_mine_new_block", True)
         self.candidate_block = None
         self.candidate_block_state = None
+        self.block_builder = None
+        self.pending_state = None
         self.latest_block_ts = None
         self.candidate_block_loop_chk = LoopingCall(self.mine_and_broadcast_block)
         self.leader_node = None
@@ -351,6 +611,8 @@ class MinerNode(ChainNode):
         d = super().disconnect()
         if self.candidate_block_loop_chk and self.candidate_block_loop_chk.running:
             self.candidate_block_loop_chk.stop()
+        if self.mempool_journal is not None:
+            self.mempool_journal.close()
         return d
 
     @property
@@ -397,11 +659,33 @@ class MinerNode(ChainNode):
         return self.leader_node
 
     def load_chain(self):
-        super().load_chain(new_head_cb=self.on_new_head)
+        super().load_chain(new_head_cb=self.on_new_head, rollback_cb=self.on_rollback_block)
         if self.chain.initialized():
             pass
             # self.elect_leader()
 
+    def load_state(self):
+        super().load_state()
+        self.block_builder = CandidateBlockBuilder(self.state, self.chain, coinbase=self.id)
+        self.pending_state = PendingState(self.state, self.txqueue)
+        self.load_mempool()
+
+    def load_mempool(self):
+        """Restores transaction queue from the mempool journal, skipping transactions which got doomed
+        by the chain meanwhile."""
+        join = AppConfig["pj"]
+        self.mempool_journal = MempoolJournal(join(AppConfig["storage_path"], AppConfig["mempool_journal"]))
+        pending = [txn for txn in self.mempool_journal.replay() if self.is_admissible(txn)]
+        for txn in super().receive_transactions(pending):
+            if self.is_admissible(txn):
+                self.txqueue.add_transaction(txn)
+        self.mempool_journal.compact(list(self.txqueue.transactions()))
+        log.msg("Restored %s transactions from mempool journal" % len(self.txqueue))
+
+    def maybe_compact_mempool_journal(self):
+        if self.mempool_journal is not None and self.mempool_journal.needs_compaction(len(self.txqueue)):
+            self.mempool_journal.compact(list(self.txqueue.transactions()))
+
     @defer.inlineCallbacks
     def elect_leader(self):
         log.msg("Electing new leader")
@@ -431,16 +715,29 @@ class MinerNode(ChainNode):
             self.elect_leader()
 
     def on_new_head(self, block):
+        self.txqueue.expire()
         if block.body:
             self.txqueue = self.txqueue.diff(block.body)
+            # drop pending transactions which nonces got used by the block
+            for address in {txn.sender_address for txn in block.body}:
+                self.txqueue.remove_stale(address, self.state.account_nonce(address))
+            self.maybe_compact_mempool_journal()
+        if self.block_builder is not None:
+            self.block_builder.invalidate()
         self.ready_mine_new_block = True
         self.latest_block_ts = block.time
         # In case mining node started without any data
         if isinstance(block, GenesisBlock):
             self.elect_leader()
 
+    def on_rollback_block(self, block_number):
+        # failed block cleared the state of its number, candidate block of the same number keeps its state there
+        if self.block_builder is not None and self.block_builder.started \
+                and self.block_builder.block.number == block_number:
+            self.block_builder.invalidate()
+
     def maybe_new_block(self):
-        if len(self.txqueue) >= self.genesis_block.min_tx_bound:
+        if len(self.block_builder) >= self.genesis_block.min_tx_bound:
             # more than 10 transaction in resided the queue
             return True
         if self.latest_block_ts is None:
@@ -457,13 +754,11 @@ class MinerNode(ChainNode):
             #. 10 minutes has left from the last time
         """
         if self.ready_mine_new_block:
+            if not self.block_builder.started:
+                self.block_builder.start(self.txqueue)
             if not self.maybe_new_block():
                 return
-            txqueue = deepcopy(self.txqueue)
-            self.candidate_block, self.candidate_block_state = make_candidate_block(self.state,
-                                                                                    self.chain,
-                                                                                    txqueue=txqueue,
-                                                                                    coinbase=self.id)
+            self.candidate_block, self.candidate_block_state = self.block_builder.take()
             self.ready_mine_new_block = False
             self.latest_block_ts = self.candidate_block.time
             log.msg("Built candidate block=%s with %s transactions" % (self.candidate_block.number,
@@ -489,7 +784,7 @@ class MinerNode(ChainNode):
     def receive_leader_election_request(self, request, sender):
         response = LeaderResponseMessage(self.id)
         response.request_id = request.request_id
-        sender.sendString(response.serialize())
+        sender.send_message(response)
         # Reelect leader if necessary
         if self.can_mine and request.address > self.id:
             self.can_mine = False
@@ -501,16 +796,72 @@ class MinerNode(ChainNode):
     def receive_leader_election_response(self, request, sender):
         self.receive_response(request)
 
-    def receive_transaction(self, transaction):
-        verify_status = super().receive_transaction(transaction)
-        if verify_status:
-            self.txqueue.add_transaction(transaction)
+    def receive_transactions(self, transactions):
+        # already queued and doomed transactions aren't verified
+        transactions = [txn for txn in transactions
+                        if not self.txqueue.contains(txn.id) and self.is_admissible(txn)]
+        verified = super().receive_transactions(transactions)
+        if verified:
+            self.txqueue.expire()
+            queued = []
+            for transaction in verified:
+                # preceding transactions of the burst may have spent sender's balance
+                if not self.is_admissible(transaction):
+                    continue
+                if self.txqueue.add_transaction(transaction):
+                    queued.append(transaction)
+                else:
+                    log.msg("Transaction with id=%s or its nonce is already queued." % transaction.id)
+            if self.mempool_journal is not None:
+                self.mempool_journal.append(queued)
+                self.maybe_compact_mempool_journal()
             log.msg("RECEIVED TX TO QUEUE: %s" % len(self.txqueue))
             if self.can_mine:
+                self.block_builder.add_transactions(self.txqueue, queued)
                 self.mine_and_broadcast_block()
+        return verified
+
+    def is_admissible(self, txn):
+        """
+        :param txn: incoming transaction
+        :type txn: ccoin.messages.Transaction
+        :return: whether transaction can be applied on top of pending transactions
+        :rtype: bool
+        """
+        try:
+            self.pending_state.check(txn)
+        except TransactionApplyException as ex:
+            metrics.incr("mempool.rejected.doomed")
+            log.msg("Transaction with id=%s is rejected: %s" % (txn.id, ex))
+            return False
+        return True
+
+    def find_inventory(self, msg_type, msg_id):
+        message = super().find_inventory(msg_type, msg_id)
+        if message is None and msg_type == Transaction.identifier:
+            message = self.txqueue.get(msg_id)
+        return message
+
+    def compact_block_transactions(self):
+        return itertools.chain(super().compact_block_transactions(), self.txqueue.transactions())
+
+    def get_account_nonce(self, account_addr):
+        nonce_data = super().get_account_nonce(account_addr)
+        if nonce_data is not None:
+            nonce_data["pending_nonce"] = self.pending_state.pending_nonce(account_addr)
+        return nonce_data
 
     def receive_block(self, block):
-        super().receive_block(block)
+        return super().receive_block(block)
+
+    def get_metrics(self):
+        data = super().get_metrics()
+        data["mempool"] = {
+            "transactions": len(self.txqueue),
+            "bytes": self.txqueue.bytes,
+            "senders": len(self.txqueue.senders),
+        }
+        return data
 
 
 
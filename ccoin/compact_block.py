@@ -0,0 +1,139 @@
+"""Compact block relay.
+
+Instead of the full block, miner relays the block header and short ids of its transactions to peers that advertise
+the protocol at handshake. Receiving node reconstructs the block body from transactions it already has, e.g. under
+the transaction queue, and requests only missing ones with get block transactions (GBT) message. If reconstructed
+body doesn't match transactions root of the header (short ids may collide), the full block is requested with get
+data message. Peers that don't advertise the protocol keep receiving full blocks.
+
+Short transaction id is the first `CompactBlockMessage.SHORT_ID_LENGTH` bytes of sha256 of the salt and transaction
+id. Salt is random per compact block, so that collisions can't be crafted in advance.
+"""
+import hashlib
+import os
+
+from ccoin.messages import CompactBlockMessage, TransactionList
+
+FEATURE_COMPACT_BLOCKS = "cmpct1"
+
+SALT_LENGTH = 8
+
+
+def short_txn_id(salt, txn_id):
+    """
+    :param salt: hex encoded salt
+    :type salt: str
+    :param txn_id: hex encoded transaction id
+    :type txn_id: str
+    :return: hex encoded short transaction id
+    :rtype: str
+    """
+    digest = hashlib.sha256(bytes.fromhex(salt) + bytes.fromhex(txn_id)).hexdigest()
+    return digest[:2 * CompactBlockMessage.SHORT_ID_LENGTH]
+
+
+def make_compact_block(block, address, salt=None):
+    """
+    :param block: mined block
+    :type block: ccoin.messages.Block
+    :param address: sender address
+    :type address: str
+    :param salt: hex encoded salt, random if not given
+    :type salt: str
+    :rtype: CompactBlockMessage
+    """
+    salt = salt or os.urandom(SALT_LENGTH).hex()
+    short_ids = [short_txn_id(salt, txn.id) for txn in block.body]
+    return CompactBlockMessage(block.header(), salt, short_ids, address)
+
+
+class PartialBlock(object):
+    """Block being reconstructed from compact block.
+
+    Attributes:
+        compact (CompactBlockMessage): received compact block
+        sender (ccoin.p2p_network.BasePeerConnection): peer connection the compact block came from
+        txns (list): transactions of the block in block order, None where transaction is missing
+    """
+
+    def __init__(self, compact, sender):
+        """
+        :param compact: compact block
+        :type compact: CompactBlockMessage
+        :param sender: peer connection the compact block came from
+        :type sender: ccoin.p2p_network.BasePeerConnection
+        """
+        self.compact = compact
+        self.sender = sender
+        self.txns = [None] * len(compact.short_ids)
+
+    @property
+    def id(self):
+        return self.compact.id
+
+    @property
+    def missing(self):
+        """
+        :return: positions of missing transactions
+        :rtype: list[int]
+        """
+        return [index for index, txn in enumerate(self.txns) if txn is None]
+
+    @property
+    def is_complete(self):
+        return None not in self.txns
+
+    def fill(self, txns):
+        """
+        Fills transactions the node already has. Transactions whose short ids collide are left missing.
+        :param txns: transactions known to the node
+        :type txns: collections.Iterable[ccoin.messages.Transaction]
+        :return: number of filled transactions
+        :rtype: int
+        """
+        wanted = set(self.compact.short_ids)
+        known = {}
+        for txn in txns:
+            short_id = short_txn_id(self.compact.salt, txn.id)
+            if short_id not in wanted:
+                continue
+            if short_id in known and (known[short_id] is None or known[short_id].id != txn.id):
+                # ambiguous, the transaction is requested
+                known[short_id] = None
+            else:
+                known.setdefault(short_id, txn)
+        filled = 0
+        for index, short_id in enumerate(self.compact.short_ids):
+            txn = known.get(short_id)
+            if self.txns[index] is None and txn is not None:
+                self.txns[index] = txn
+                filled += 1
+        return filled
+
+    def add(self, indexes, txns):
+        """
+        Adds requested transactions.
+        :param indexes: positions of transactions in the block
+        :type indexes: list[int]
+        :param txns: transactions
+        :type txns: list[ccoin.messages.Transaction]
+        :return: whether transactions match requested short ids
+        :rtype: bool
+        """
+        if len(indexes) != len(txns):
+            return False
+        for index, txn in zip(indexes, txns):
+            if not 0 <= index < len(self.txns) or \
+                    short_txn_id(self.compact.salt, txn.id) != self.compact.short_ids[index]:
+                return False
+            self.txns[index] = txn
+        return True
+
+    def to_block(self):
+        """
+        :return: reconstructed block, its transactions root isn't verified
+        :rtype: ccoin.messages.Block
+        """
+        block = self.compact.header.message
+        block.body = TransactionList(self.txns)
+        return block
@@ -0,0 +1,90 @@
+import time
+import zlib
+
+from ccoin.exceptions import MessageDecompressionException
+from ccoin.metrics import metrics
+
+# Compressed frame is message identifier + COMPRESSED_MARKER + compressed body. Map and compact
+# bodies never start with it, so compressed frames are recognized without extra negotiation.
+COMPRESSED_MARKER = b"\x03"
+
+# Codec names exchanged at handshake. Changing the dictionary requires a new codec name, because
+# both sides have to use byte-identical dictionaries.
+CODEC_ZLIB = "zlib1"
+CODECS = (CODEC_ZLIB, )
+
+_PUBLIC_KEY_HEADER = b"-----BEGIN PUBLIC KEY-----\nMIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQ"
+_PUBLIC_KEY_FOOTER = b"\n-----END PUBLIC KEY-----\n"
+
+# zlib prefers matches close to the end of the dictionary, so the most frequent strings go last.
+ZLIB_DICTIONARY = b"".join([
+    b"request_idaddresswire_formatscodecsblock_numberblocks",
+    b"hash_parenthash_statehash_txnscoinbasedifficultyrewardnoncebody",
+    b"numberidfromtotimeamountdatasignaturescheme",
+    _PUBLIC_KEY_HEADER,
+    _PUBLIC_KEY_FOOTER,
+    _PUBLIC_KEY_HEADER.hex().encode(),
+    _PUBLIC_KEY_FOOTER.hex().encode(),
+])
+
+
+def is_compressed(frame):
+    """
+    :param frame: message frame
+    :type frame: bytes
+    :rtype: bool
+    """
+    return frame[3:4] == COMPRESSED_MARKER
+
+
+def compress_frame(frame, level=6):
+    """
+    Compresses message frame, leaving its identifier readable.
+    :param frame: message frame
+    :type frame: bytes
+    :param level: zlib compression level
+    :type level: int
+    :return: compressed frame
+    :rtype: bytes
+    """
+    started = time.process_time()
+    compressor = zlib.compressobj(level, zdict=ZLIB_DICTIONARY)
+    compressed = frame[:3] + COMPRESSED_MARKER + compressor.compress(frame[3:]) + compressor.flush()
+    metrics.observe("compression.compress", time.process_time() - started)
+    metrics.incr("compression.frames")
+    metrics.incr("compression.bytes_in", len(frame))
+    metrics.incr("compression.bytes_out", len(compressed))
+    return compressed
+
+
+def decompress_frame(frame, max_length):
+    """
+    Restores original message frame from the compressed one.
+    :param frame: compressed message frame
+    :type frame: bytes
+    :param max_length: max length of restored frame body, guards against decompression bombs
+    :type max_length: int
+    :return: original message frame
+    :rtype: bytes
+    :raises MessageDecompressionException: frame is corrupted or exceeds max_length
+    """
+    started = time.process_time()
+    decompressor = zlib.decompressobj(zdict=ZLIB_DICTIONARY)
+    try:
+        body = decompressor.decompress(frame[4:], max_length)
+    except zlib.error as exc:
+        raise MessageDecompressionException(frame[:3].decode(errors="replace"), str(exc))
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise MessageDecompressionException(frame[:3].decode(errors="replace"),
+                                            "body exceeds %s bytes or is truncated" % max_length)
+    metrics.observe("compression.decompress", time.process_time() - started)
+    return frame[:3] + body
+
+
+def compression_ratio():
+    """
+    :return: compressed to original size ratio of all frames compressed so far
+    :rtype: float
+    """
+    bytes_in = metrics.counters["compression.bytes_in"]
+    return metrics.counters["compression.bytes_out"] / bytes_in if bytes_in else 1.0
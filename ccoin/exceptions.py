@@ -36,6 +36,16 @@ class NotSupportedMessage(BaseException):
         self.msg_type = msg_type
 
 
+class MessageDecompressionException(BaseException):
+
+    def __init__(self, msg_type, reason):
+        self.msg_type = msg_type
+        self.reason = reason
+
+    def __str__(self):
+        return "DecompressionError: Cannot decompress %s message: %s" % (self.msg_type, self.reason)
+
+
 class BlockApplyException(BaseException):
 
     def __init__(self, block):
@@ -116,6 +126,13 @@ class TransactionNotVerifiable(TransactionApplyException):
         return "Transaction with id=%s is not verifiable. Please sign it first." % self.txn.id
 
 
+class TransactionSenderKeyUnknown(TransactionNotVerifiable):
+
+    def __str__(self):
+        return "Transaction with id=%s references sender by address=%s, but its public key is not registered." % (
+            self.txn.id, self.txn.sender_address)
+
+
 class TransactionBadNonce(TransactionApplyException):
 
     def __str__(self):
@@ -128,6 +145,21 @@ class TransactionSenderIsOutOfCoins(TransactionApplyException):
         return "Transaction error: sender has less than %s coins on his balance" % self.txn.number
 
 
+class UnknownSignatureScheme(BaseException):
+
+    def __init__(self, scheme):
+        self.scheme = scheme
+
+    def __str__(self):
+        return "Signature scheme=%s is not supported." % self.scheme
+
+
+class TransactionQueueChanged(BaseException):
+
+    def __str__(self):
+        return "Transaction queue has changed since the snapshot was taken"
+
+
 class SenderStateDoesNotExist(BaseException):
 
     def __init__(self, sender_address):
@@ -135,3 +167,13 @@ class SenderStateDoesNotExist(BaseException):
 
     def __str__(self):
         return "Sender=%s state is not committed in database." % self.sender_address
+
+
+class BlockHeadersMissing(BaseException):
+
+    def __init__(self, address, block_number):
+        self.address = address
+        self.block_number = block_number
+
+    def __str__(self):
+        return "Peer=%s didn't provide header of block=%s it reported." % (self.address, self.block_number)
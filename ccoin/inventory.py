@@ -0,0 +1,70 @@
+"""Inventory based gossip.
+
+Instead of pushing full transactions and blocks to every peer, node announces their ids with inventory (INV)
+message and peers request the ones they don't have yet with get data (GDT) message. Node remembers which
+inventory each peer already knows, so it's never announced back. Peers negotiate the protocol at handshake,
+peers that don't advertise it keep receiving full messages.
+"""
+from collections import OrderedDict
+
+from ccoin.messages import pack_field, FIELD_HEX
+
+FEATURE_INVENTORY = "inv1"
+
+
+def inventory_key(msg_type, msg_id):
+    """
+    Builds key of gossiped message, the same as the key of its compact frame in the seen messages cache.
+    :param msg_type: message identifier
+    :type msg_type: str
+    :param msg_id: message id
+    :type msg_id: str
+    :rtype: bytes
+    """
+    raw_id = pack_field(FIELD_HEX, msg_id)
+    return msg_type.encode() + (raw_id if isinstance(raw_id, bytes) else str(raw_id).encode())
+
+
+class RelayStore(object):
+    """Bounded store of messages announced or received by the node, so that they are served once peers request
+    them. The least recently added messages are dropped first."""
+
+    def __init__(self, max_size):
+        """
+        :param max_size: max number of stored messages
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self.messages = OrderedDict()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def add(self, msg):
+        """
+        :param msg: gossiped message
+        :type msg: ccoin.messages.BaseMessage
+        :return: message key
+        :rtype: bytes
+        """
+        key = inventory_key(msg.identifier, msg.id)
+        self.messages[key] = msg
+        self.messages.move_to_end(key)
+        while len(self.messages) > self.max_size:
+            self.messages.popitem(last=False)
+        return key
+
+    def get(self, key):
+        return self.messages.get(key)
+
+    def messages_of(self, msg_type):
+        """
+        :param msg_type: message identifier
+        :type msg_type: str
+        :return: stored messages of the type
+        :rtype: list[ccoin.messages.BaseMessage]
+        """
+        return [msg for msg in self.messages.values() if msg.identifier == msg_type]
+
+    def __contains__(self, key):
+        return key in self.messages
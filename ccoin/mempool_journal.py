@@ -0,0 +1,110 @@
+import os
+import struct
+
+from twisted.python import log
+
+from ccoin.messages import Transaction, WIRE_FORMAT_COMPACT
+from ccoin.utils import ensure_dir
+
+
+class MempoolJournal(object):
+    """Append-only file of transactions accepted to the transaction queue. It is replayed on node start,
+    so that pending transactions survive restarts.
+
+    Each record is little endian unsigned int length followed by transaction serialized in compact wire
+    format. Removed transactions aren't recorded, instead the journal is compacted (rewritten with
+    transactions still under the queue) once it holds much more records than the queue.
+
+    Attributes:
+        path (str): journal file path
+        records (int): number of records in the journal
+    """
+
+    structFormat = '<I'
+    prefixLength = struct.calcsize(structFormat)
+
+    # journal isn't compacted while it holds less records than that
+    COMPACT_MIN_RECORDS = 1024
+
+    def __init__(self, path):
+        """
+        :param path: journal file path
+        :type path: str
+        """
+        self.path = path
+        self.records = 0
+        self.fh = None
+
+    def open(self):
+        if self.fh is None:
+            ensure_dir(os.path.dirname(self.path))
+            self.fh = open(self.path, "ab")
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+    def pack(self, txn):
+        txn_bytes = txn.serialize(WIRE_FORMAT_COMPACT)
+        return struct.pack(self.structFormat, len(txn_bytes)) + txn_bytes
+
+    def append(self, txns):
+        """
+        Records transactions accepted to the queue.
+        :param txns: transactions
+        :type txns: list[ccoin.messages.Transaction]
+        """
+        if not txns:
+            return
+        self.open()
+        self.fh.write(b"".join(self.pack(txn) for txn in txns))
+        self.fh.flush()
+        self.records += len(txns)
+
+    def replay(self):
+        """
+        Reads recorded transactions. Truncated or corrupted tail, e.g. left by a crash, is skipped.
+        :return: transactions in the order they were recorded
+        :rtype: list[ccoin.messages.Transaction]
+        """
+        txns = []
+        if not os.path.exists(self.path):
+            return txns
+        with open(self.path, "rb") as fh:
+            data = fh.read()
+        offset = 0
+        while offset + self.prefixLength <= len(data):
+            length, = struct.unpack_from(self.structFormat, data, offset)
+            offset += self.prefixLength
+            if offset + length > len(data):
+                break
+            try:
+                txns.append(Transaction.deserialize(data[offset:offset + length]))
+            except Exception:
+                log.err()
+                break
+            offset += length
+        if offset < len(data):
+            log.msg("Skipped %s bytes of corrupted mempool journal tail" % (len(data) - offset))
+        self.records = len(txns)
+        return txns
+
+    def needs_compaction(self, queue_size):
+        return self.records > max(self.COMPACT_MIN_RECORDS, 2 * queue_size)
+
+    def compact(self, txns):
+        """
+        Rewrites the journal with transactions still under the queue.
+        :param txns: queued transactions
+        :type txns: list[ccoin.messages.Transaction]
+        """
+        self.close()
+        ensure_dir(os.path.dirname(self.path))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(b"".join(self.pack(txn) for txn in txns))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.path)
+        self.records = len(txns)
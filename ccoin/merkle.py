@@ -0,0 +1,95 @@
+"""Binary Merkle tree over transaction ids.
+
+Leaves and inner nodes are hashed with distinct prefixes, so an inner node can't be passed off as
+a leaf. A node without a sibling is promoted to the next level as is, instead of being paired with
+its own copy, hence two different transaction lists never share the same root.
+
+    leaf = sha256(0x00 + utf-8 transaction id)
+    node = sha256(0x01 + left + right)
+"""
+import binascii
+
+from ccoin.security import hash_message
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+# sides of the sibling hash within proof step
+PROOF_SIDES = (LEFT, RIGHT) = ("left", "right")
+
+
+def hash_leaf(txn_id):
+    return hash_message(LEAF_PREFIX + txn_id.encode(), hex=False)
+
+
+def hash_node(left, right):
+    return hash_message(NODE_PREFIX + left + right, hex=False)
+
+
+def next_level(level):
+    """
+    :param level: node hashes of the tree level
+    :type level: list[bytes]
+    :return: node hashes of the level above
+    :rtype: list[bytes]
+    """
+    parents = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+
+def merkle_root(txn_ids):
+    """
+    :param txn_ids: transaction ids in block order
+    :type txn_ids: list[str]
+    :return: hex-encoded root hash
+    :rtype: str
+    """
+    assert txn_ids, "Merkle tree requires at least one leaf"
+    level = [hash_leaf(txn_id) for txn_id in txn_ids]
+    while len(level) > 1:
+        level = next_level(level)
+    return binascii.hexlify(level[0]).decode()
+
+
+def merkle_proof(txn_ids, txn_id):
+    """
+    Builds inclusion proof of transaction id.
+    :param txn_ids: transaction ids in block order
+    :type txn_ids: list[str]
+    :param txn_id: id of the proven transaction
+    :type txn_id: str
+    :return: list of [side, hex-encoded sibling hash] pairs from leaf to root, None if id isn't in the list
+    :rtype: list[list] | None
+    """
+    if txn_id not in txn_ids:
+        return
+    index = txn_ids.index(txn_id)
+    level = [hash_leaf(id_) for id_ in txn_ids]
+    proof = []
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            side = LEFT if sibling < index else RIGHT
+            proof.append([side, binascii.hexlify(level[sibling]).decode()])
+        level = next_level(level)
+        index //= 2
+    return proof
+
+
+def verify_merkle_proof(txn_id, proof, root):
+    """
+    :param txn_id: id of the proven transaction
+    :type txn_id: str
+    :param proof: proof returned by `merkle_proof`
+    :type proof: list[list]
+    :param root: hex-encoded root hash
+    :type root: str
+    :rtype: bool
+    """
+    node = hash_leaf(txn_id)
+    for side, sibling in proof:
+        sibling = binascii.unhexlify(sibling)
+        node = hash_node(sibling, node) if side == LEFT else hash_node(node, sibling)
+    return binascii.hexlify(node).decode() == root
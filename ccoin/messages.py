@@ -1,21 +1,140 @@
+import base64
+import binascii
 import random
+import re
 
 import msgpack
 import time
 import json
 
 from ccoin import settings
-from ccoin.security import hash_map, sign, verify, hash_message
-from .exceptions import MessageDeserializationException, TransactionNotVerifiable, TransactionBadSignature
-from abc import ABC, abstractmethod, abstractclassmethod
+from ccoin.compression import compress_frame
+from ccoin.merkle import merkle_root, merkle_proof
+from ccoin.metrics import metrics
+from ccoin.security import sign, verify, hash_message, verified_signatures, signature_schemes, \
+    public_key_address, is_address, to_address, DEFAULT_SIGNATURE_SCHEME
+from .exceptions import MessageDeserializationException, TransactionNotVerifiable, TransactionBadSignature, \
+    TransactionSenderKeyUnknown, UnknownSignatureScheme, NotSupportedMessage
+from abc import ABCMeta, abstractmethod, abstractclassmethod
 
 
 # b'BLKfkajdkjfkjdkfj'
 
-class BaseMessage(ABC):
+# Wire formats:
+#   1. map format: HEADER + msgpack of sorted (key, value) pairs
+#   2. compact format: HEADER + COMPACT_MARKER + msgpack of positional fields,
+#      where hashes, keys and signatures are packed as raw bytes
+# Frames of both formats may be compressed, see ccoin.compression.
+WIRE_FORMATS = (WIRE_FORMAT_MAP, WIRE_FORMAT_COMPACT) = (1, 2)
+COMPACT_MARKER = b"\x02"
+
+# compact field codecs
+FIELD_RAW, FIELD_HEX, FIELD_B64, FIELD_TXNS = ("raw", "hex", "b64", "txns")
+
+_CANONICAL_HEX = re.compile(r"(?:[0-9a-f]{2})+")
+
+
+def pack_field(codec, value):
+    """Packs field value for compact wire format. Values that can't be restored exactly are kept as is."""
+    if value is None or codec == FIELD_RAW:
+        return value
+    if codec == FIELD_HEX:
+        if isinstance(value, str) and _CANONICAL_HEX.fullmatch(value):
+            return binascii.unhexlify(value)
+        return value
+    if codec == FIELD_B64:
+        try:
+            raw = base64.b64decode(value.encode('ascii'), validate=True)
+        except (ValueError, AttributeError, binascii.Error):
+            return value
+        if base64.b64encode(raw).decode('ascii') == value:
+            return raw
+        return value
+    if codec == FIELD_TXNS:
+        return [Transaction.pack_compact(txn) for txn in value]
+    assert False, "Unrecognized field codec"
+
+
+def unpack_field(codec, value):
+    """Restores field value packed by `pack_field`."""
+    if value is None or codec == FIELD_RAW:
+        return value
+    if codec == FIELD_HEX:
+        if isinstance(value, bytes):
+            return binascii.hexlify(value).decode()
+        return value
+    if codec == FIELD_B64:
+        if isinstance(value, bytes):
+            return base64.b64encode(value).decode('ascii')
+        return value
+    if codec == FIELD_TXNS:
+        return [Transaction.unpack_compact(txn) for txn in value]
+    assert False, "Unrecognized field codec"
+
+
+# maps message identifier to message class, populated once classes are defined
+message_registry = {}
+
+
+def decode_message(bytes):
+    """
+    Decodes message of any registered type.
+    :param bytes: serialized message
+    :type bytes: bytes
+    :return: message instance
+    :rtype: BaseMessage
+    :raises: NotSupportedMessage
+    """
+    msg_type = bytes[:3].decode()
+    kls = message_registry.get(msg_type)
+    if kls is None:
+        raise NotSupportedMessage(msg_type)
+    return kls.decode(msg_type, bytes)
+
+
+class BaseMessage(metaclass=ABCMeta):
+    """Base class of all network messages.
+
+    Encodings and digests of message are memoized and reused until any of message fields is changed,
+    e.g. by `Block.set_hash_state`, `Block.set_transactions` or `Transaction.generate_id`.
+
+    Messages held in large numbers (transactions, blocks) declare `__slots__`, so they don't carry
+    per-instance dict. ABCMeta is used directly, because `abc.ABC` has no `__slots__` on Python 3.6.
+    """
+
+    __slots__ = ("_memo", )
 
     identifier = None
 
+    # positional (field name, codec) pairs of compact wire format
+    compact_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__dict__.get("identifier"):
+            message_registry[cls.identifier] = cls
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if not name.startswith("_"):
+            # message has changed, so memoized encodings and digests are stale
+            object.__setattr__(self, "_memo", None)
+
+    def memoize(self, key, compute):
+        """
+        Returns memoized value of `compute()` under the key.
+        :param key: memo key
+        :param compute: callable that computes value
+        :type compute: callable
+        """
+        memo = getattr(self, "_memo", None)
+        if memo is None:
+            memo = {}
+            object.__setattr__(self, "_memo", memo)
+        if key not in memo:
+            memo[key] = compute()
+        return memo[key]
+
     @classmethod
     def deserialize(cls, bytes):
         """
@@ -28,19 +147,101 @@ class BaseMessage(ABC):
         msg_type = bytes[:3].decode()
         if cls.identifier != msg_type:
             raise MessageDeserializationException(cls.identifier, msg_type)
-        data = dict(cls.loads(bytes[3:]))
+        return cls.decode(msg_type, bytes)
+
+    @classmethod
+    def decode(cls, msg_type, bytes):
+        """Decodes message of any wire format with class `cls`."""
+        metrics.incr("messages.decoded.%s" % msg_type)
+        wire_format = cls.wire_format_of(bytes)
+        if wire_format == WIRE_FORMAT_COMPACT:
+            data = cls.unpack_compact(cls.loads(bytes[4:]))
+        else:
+            data = dict(cls.loads(bytes[3:]))
+        # received bytes aren't memoized: they may be non-canonical, e.g. padded, so relaying, storing
+        # and size accounting use canonical encoding
         return cls.from_dict(data)
 
-    def serialize(self):
+    @staticmethod
+    def wire_format_of(bytes):
+        """Returns wire format of serialized message."""
+        if bytes[3:4] == COMPACT_MARKER:
+            return WIRE_FORMAT_COMPACT
+        return WIRE_FORMAT_MAP
+
+    @classmethod
+    def peek_id(cls, bytes):
+        """
+        Reads message id without building the message. Compact frame is read up to the id field only.
+        :param bytes: serialized message
+        :type bytes: bytes
+        :return: message id, None if message has no id
+        :rtype: str | None
+        """
+        if cls.wire_format_of(bytes) != WIRE_FORMAT_COMPACT:
+            msg_id = dict(cls.loads(bytes[3:])).get("id")
+            return msg_id if isinstance(msg_id, str) else None
+        fields = dict(cls.compact_fields)
+        if "id" not in fields:
+            return
+        names = [name for name, _ in cls.compact_fields]
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(bytes[4:])
+        if unpacker.read_array_header() <= names.index("id"):
+            return
+        for _ in range(names.index("id")):
+            unpacker.skip()
+        msg_id = unpack_field(fields["id"], unpacker.unpack())
+        return msg_id if isinstance(msg_id, str) else None
+
+    def serialize(self, wire_format=WIRE_FORMAT_MAP):
         """
         Returns bytes representing the object
+        :param wire_format: one of WIRE_FORMATS, map format is understood by all peers
+        :type wire_format: int
         :return: bytes
         :rtype: bytes
         """
+        if wire_format == WIRE_FORMAT_COMPACT and self.compact_fields:
+            return self.memoize(("serialized", wire_format), self._serialize_compact)
+        return self.memoize(("serialized", WIRE_FORMAT_MAP), self._serialize)
+
+    def serialize_compressed(self, wire_format=WIRE_FORMAT_MAP, level=6):
+        """
+        Returns compressed bytes representing the object. Compressed frame is memoized, so broadcasting
+        message to many peers compresses it once.
+        :param wire_format: one of WIRE_FORMATS
+        :type wire_format: int
+        :param level: zlib compression level
+        :type level: int
+        :rtype: bytes
+        """
+        return self.memoize(("compressed", wire_format, level),
+                            lambda: compress_frame(self.serialize(wire_format), level))
+
+    def _serialize(self):
         sorted_data = sorted(self.to_dict().items())
         msg_bytes = self.dumps(sorted_data)
         return self.identifier.encode() + msg_bytes
 
+    def _serialize_compact(self):
+        msg_bytes = self.dumps(self.pack_compact(self.compact_dict()), use_bin_type=True)
+        return self.identifier.encode() + COMPACT_MARKER + msg_bytes
+
+    def compact_dict(self):
+        """Returns dict representation packed into compact wire format."""
+        return self.to_dict()
+
+    @classmethod
+    def pack_compact(cls, data):
+        """Packs message dict representation into positional list of compact wire format."""
+        return [pack_field(codec, data.get(name)) for name, codec in cls.compact_fields]
+
+    @classmethod
+    def unpack_compact(cls, values):
+        """Restores message dict representation from positional list of compact wire format."""
+        return {name: unpack_field(codec, value) for (name, codec), value in zip(cls.compact_fields, values)}
+
     @abstractmethod
     def to_dict(self):
         """
@@ -63,8 +264,8 @@ class BaseMessage(ABC):
         pass
 
     @staticmethod
-    def dumps(ds):
-        return msgpack.packb(ds)
+    def dumps(ds, **kwargs):
+        return msgpack.packb(ds, **kwargs)
 
     @staticmethod
     def loads(bytes):
@@ -77,15 +278,25 @@ class Transaction(BaseMessage):
     Attributes:
         id (str): hash of the transaction
         number (int): transaction index id.
-        to (str): address of the recipient account.
-        from_ (str): address of the sender account.
+        to (str): recipient's address or hex-encoded public key.
+        from_ (str): sender's hex-encoded public key or address, if sender's key is already
+            registered in the world state key registry.
         amount (int): amount of money spent by sender and credited to the recipient
         data (varies): attached data
-        signature: RSA signature created from the transaction message with sender's private key
+        signature: signature created from the transaction message with sender's private key
+        scheme (str): name of the signature scheme of sender's keys e.g. rsa, ed25519
     """
     identifier = "TXN"
 
-    def __init__(self, number, from_, to=None, id=None, amount=0, data=None, signature=None, time=None):
+    compact_fields = (("id", FIELD_HEX), ("number", FIELD_RAW), ("from", FIELD_HEX), ("to", FIELD_HEX),
+                      ("time", FIELD_RAW), ("amount", FIELD_RAW), ("data", FIELD_RAW),
+                      ("signature", FIELD_B64), ("scheme", FIELD_RAW))
+
+    __slots__ = ("id", "number", "from_", "to", "amount", "data", "time", "signature", "scheme",
+                 "resolved_sender_key")
+
+    def __init__(self, number, from_, to=None, id=None, amount=0, data=None, signature=None, time=None,
+                 scheme=DEFAULT_SIGNATURE_SCHEME):
         self.id = id
         self.number = number
         self.from_ = from_
@@ -93,8 +304,10 @@ class Transaction(BaseMessage):
         self.amount = amount
         self.data = data
         self.time = time
-        # RSA signature
         self.signature = signature
+        self.scheme = scheme
+        # public key of address-referenced sender resolved from the key registry
+        self.resolved_sender_key = None
 
     @property
     def sender(self):
@@ -102,7 +315,21 @@ class Transaction(BaseMessage):
 
     @property
     def sender_address(self):
-        return self.sender[115:155]
+        return to_address(self.sender)
+
+    @property
+    def sender_is_address(self):
+        return is_address(self.from_)
+
+    @property
+    def sender_public_key(self):
+        if self.sender_is_address:
+            return self.resolved_sender_key
+        return self.from_
+
+    def set_sender_public_key(self, public_key):
+        """Attaches sender's public key resolved from the key registry to address-referenced transaction."""
+        self.resolved_sender_key = public_key
 
     @property
     def recipient(self):
@@ -110,7 +337,7 @@ class Transaction(BaseMessage):
 
     @property
     def recipient_address(self):
-        return self.recipient[115:155]
+        return to_address(self.recipient)
 
     @property
     def nonce(self):
@@ -122,33 +349,54 @@ class Transaction(BaseMessage):
         self.time = time.time()
         return self.id
 
+    def signing_bytes(self):
+        """Returns canonical encoding of transaction fields covered by signature."""
+        def compute():
+            data = self.to_dict()
+            data.pop("signature", None)
+            return self.dumps(sorted(data.items()))
+        return self.memoize("signing_bytes", compute)
+
+    def signing_digest(self):
+        """Returns raw hash of canonical signing encoding."""
+        return self.memoize("signing_digest", lambda: hash_message(self.signing_bytes(), hex=False))
+
     def get_hash(self):
         """Generates transaction hash."""
-        data = self.to_dict()
-        data.pop("signature", None)
-        return hash_map(data)
+        return self.memoize("hash", lambda: hash_message(self.signing_bytes()))
 
     @property
     def is_signed(self):
         return self.signature is not None
 
     def sign(self, private_key):
-        """Signs transaction with account’s secret key and returns signature. Sets signature and sender's public key"""
-        data = self.to_dict()
-        data.pop("signature", None)
-        digest = hash_map(data, hex=False)
+        """Signs transaction with account’s secret key and returns signature. Sets signature and sender's public key
+        :param private_key: parsed private key object (see `ccoin.accounts.Account.load_private_key`) or
+            hex-encoded private key
+        """
         if self.signature is None:
-            self.signature = sign(private_key, digest)
+            self.signature = sign(private_key, self.signing_digest(), scheme=self.scheme)
         return self.signature
 
     def verify(self):
-        """Verifies signatures of transaction"""
-        if self.signature is None:
+        """Verifies signatures of transaction. Successfully verified signatures are remembered,
+        so the same transaction is checked only once per node."""
+        if self.signature is None or self.scheme not in signature_schemes:
             raise TransactionNotVerifiable(self)
-        data = self.to_dict()
-        data.pop("signature", None)
-        digest = hash_map(data, hex=False)
-        if verify(self.signature, digest, self.from_):
+        public_key = self.sender_public_key
+        if public_key is None:
+            raise TransactionSenderKeyUnknown(self)
+        try:
+            if public_key_address(public_key) != self.sender_address:
+                raise TransactionSenderKeyUnknown(self)
+        except UnknownSignatureScheme:
+            raise TransactionNotVerifiable(self)
+        digest = self.signing_digest()
+        cache_key = verified_signatures.make_key(self.id, self.signature, digest)
+        if cache_key in verified_signatures:
+            return
+        if verify(self.signature, digest, public_key, scheme=self.scheme):
+            verified_signatures.add(cache_key)
             return
         raise TransactionBadSignature(self)
 
@@ -164,6 +412,8 @@ class Transaction(BaseMessage):
             data["data"] = self.data
         if self.is_signed:
             data["signature"] = self.signature
+        if self.scheme != DEFAULT_SIGNATURE_SCHEME:
+            data["scheme"] = self.scheme
         return data
 
     @classmethod
@@ -175,11 +425,14 @@ class Transaction(BaseMessage):
                    time=data.get("time", None),
                    amount=data.get("amount", None),
                    data=data.get("data", None),
-                   signature=data.get("signature", None),)
+                   signature=data.get("signature", None),
+                   scheme=data.get("scheme") or DEFAULT_SIGNATURE_SCHEME,)
 
 
 class CoinbaseTransaction(Transaction):
 
+    __slots__ = ()
+
     def __init__(self, number, from_to, id=None, amount=0, data=None, signature=None):
         super(CoinbaseTransaction, self).__init__(number,
                                                   from_=from_to,
@@ -196,6 +449,8 @@ class TransactionList(object):
             txns (list): list of transactions
     """
 
+    __slots__ = ("txns", )
+
     def __init__(self, txns):
         """
         :param txns: transaction list
@@ -203,12 +458,29 @@ class TransactionList(object):
         """
         self.txns = txns or []
 
-    def calc_hash(self):
+    def calc_hash(self, version=settings.TXNS_ROOT_LIST):
+        """
+        :param version: transaction root version, one of settings.TXNS_ROOT_VERSIONS
+        :type version: int
+        :return: hex-encoded transaction root
+        :rtype: str
+        """
         if not self.txns:
             return settings.BLANK_SHA_256
         txn_ids = [txn.id for txn in self.txns]
+        if version == settings.TXNS_ROOT_MERKLE:
+            return merkle_root(txn_ids)
         return hash_message(msgpack.packb(txn_ids))
 
+    def calc_proof(self, txn_id):
+        """
+        Builds Merkle inclusion proof of transaction, see `ccoin.merkle.merkle_proof`.
+        :param txn_id: transaction id
+        :type txn_id: str
+        :rtype: list[list] | None
+        """
+        return merkle_proof([txn.id for txn in self.txns], txn_id)
+
     def __iter__(self):
         return iter(self.txns)
 
@@ -242,6 +514,15 @@ class Block(BaseMessage):
     """
 
     identifier = "BLK"
+
+    compact_fields = (("number", FIELD_RAW), ("id", FIELD_HEX), ("hash_parent", FIELD_HEX),
+                      ("hash_state", FIELD_HEX), ("hash_txns", FIELD_HEX), ("coinbase", FIELD_HEX),
+                      ("body", FIELD_TXNS), ("data", FIELD_RAW), ("nonce", FIELD_RAW), ("time", FIELD_RAW),
+                      ("reward", FIELD_RAW), ("difficulty", FIELD_RAW))
+
+    __slots__ = ("number", "id", "hash_state", "hash_parent", "hash_txns", "body", "coinbase", "data", "nonce",
+                 "time", "reward", "difficulty")
+
     DEFAULT_REWARD = 100
     DEFAULT_DIFFICULTY = 4  # four zeroes
 
@@ -279,9 +560,9 @@ class Block(BaseMessage):
         if not self.hash_state:
             self.hash_state = hash_state
 
-    def set_transactions(self, txns):
+    def set_transactions(self, txns, txns_root_version=settings.TXNS_ROOT_LIST):
         self.body = TransactionList(txns)
-        self.hash_txns = self.body.calc_hash()
+        self.hash_txns = self.body.calc_hash(txns_root_version)
 
     def get_transactions_hash(self):
         if not self.hash_txns:
@@ -289,12 +570,25 @@ class Block(BaseMessage):
         return self.hash_txns
 
     def get_hash(self):
+        return self.memoize("hash", self._get_hash)
+
+    def _get_hash(self):
         concat_str = str(self.number) + self.hash_parent + self.hash_state + self.hash_txns + str(self.time)
         if self.data:
             concat_str += self.data
         concat_bytes = concat_str.encode()
         return hash_message(concat_bytes)
 
+    def header(self):
+        """
+        Returns block header: the block without transactions. Header keeps transactions root, so its id
+        and proof of work are verified without the body.
+        :rtype: Block
+        """
+        data = self.to_dict()
+        data["body"] = []
+        return type(self).from_dict(data)
+
     def get_pow_hash(self, nonce, block_hash):
         concat_str = "%s%s" % (nonce, block_hash)
         return hash_message(concat_str.encode())
@@ -307,15 +601,11 @@ class Block(BaseMessage):
         :param bytes:
         :return:
         """
-        blk_registry = {cls.identifier: cls}
-        for kls in Block.__subclasses__():
-            blk_registry[kls.identifier] = kls
         blk_type = bytes[:3].decode()
-        if blk_type not in blk_registry:
+        kls = message_registry.get(blk_type)
+        if kls is None or not issubclass(kls, Block):
             raise MessageDeserializationException(cls.identifier, blk_type)
-        kls = blk_registry.get(blk_type)
-        data = dict(kls.loads(bytes[3:]))
-        return kls.from_dict(data)
+        return kls.decode(blk_type, bytes)
 
     def to_dict(self):
         data = {
@@ -343,12 +633,12 @@ class Block(BaseMessage):
             id=data.get("id"),
             number=data["number"],
             hash_parent=data["hash_parent"],
-            hash_state=data["hash_state"],
+            hash_state=data.get("hash_state"),
             hash_txns=data.get("hash_txns"),
             coinbase=data.get("coinbase"),
             body=[Transaction.from_dict(t) for t in data["body"]],
             data=data.get("data"),
-            nonce=data.get("nonce", 0),
+            nonce=data.get("nonce") or 0,
             time=data.get("time"),
             reward=data.get("reward", cls.DEFAULT_REWARD),
             difficulty=data.get("difficulty", cls.DEFAULT_DIFFICULTY)
@@ -363,6 +653,8 @@ class GenesisBlock(Block):
 
     identifier = "GLK"   # genesis block
 
+    __slots__ = ("loaded_data", )
+
     @classmethod
     def loadFromConfig(cls, config):
         """
@@ -375,7 +667,8 @@ class GenesisBlock(Block):
                 "reward": 100, # 100 coins is coinbase transaction in every block mined by miner
                 "difficulty": 4,
                 "allow_empty": true, # allow empty block
-                "placeholder_data": ["rnd", 15] # if empty block get mined it will be extended with extra 15 bits of data
+                "placeholder_data": ["rnd", 15], # if empty block get mined it will be extended with extra 15 bits of data
+                "txns_root_version": 2 # Merkle transaction root, hash of transaction ids list if missing
             },
             "network_id": 1,
             "max_peers": 0, # maximum amount of peers per node (if 0 => unlimited)
@@ -422,6 +715,10 @@ class GenesisBlock(Block):
     def min_tx_bound(self):
         return self.loaded_data["block_mining"]["min_bound"]
 
+    @property
+    def max_tx_bound(self):
+        return self.loaded_data["block_mining"]["max_bound"]
+
     @property
     def blk_placeholder_config(self):
         return self.loaded_data["block_mining"]["placeholder_data"]
@@ -434,6 +731,10 @@ class GenesisBlock(Block):
     def interval(self):
         return self.loaded_data["block_mining"]["interval"]
 
+    @property
+    def txns_root_version(self):
+        return self.loaded_data["block_mining"].get("txns_root_version", settings.TXNS_ROOT_LIST)
+
     def get_miners(self):
         """Returns miners's addresses list."""
         return self.loaded_data["miners"]
@@ -443,8 +744,82 @@ class GenesisBlock(Block):
         return address in self.get_miners()
 
 
+class LazyMessage(object):
+    """Keeps raw message bytes (or undecoded dict representation) and decodes message on first access.
+    Attributes that are not defined here are proxied to the decoded message, so messages that are
+    just forwarded or stored are never decoded."""
+
+    def __init__(self, raw=None, data=None, kls=None, message=None):
+        """
+        :param raw: serialized message
+        :type raw: bytes
+        :param data: dict representation of message
+        :type data: dict
+        :param kls: message class to decode serialized or dict representation with, other message types
+            are rejected
+        :param message: already decoded message
+        :type message: BaseMessage
+        """
+        self.raw = raw
+        self.data = data
+        self.kls = kls
+        self._message = message
+
+    @classmethod
+    def wrap(cls, value, kls):
+        """Wraps serialized, dict or decoded representation of `kls` message."""
+        if isinstance(value, LazyMessage):
+            return value
+        if isinstance(value, bytes):
+            return cls(raw=value, kls=kls)
+        if isinstance(value, dict):
+            return cls(data=value, kls=kls)
+        return cls(message=value)
+
+    @property
+    def identifier(self):
+        if self.raw is not None:
+            return self.raw[:3].decode()
+        if self._message is not None:
+            return self._message.identifier
+        return self.kls.identifier
+
+    @property
+    def is_decoded(self):
+        return self._message is not None
+
+    @property
+    def message(self):
+        """Returns decoded message."""
+        if self._message is None:
+            if self.raw is not None:
+                # raises MessageDeserializationException if peer embedded message of another type
+                self._message = self.kls.deserialize(self.raw)
+            else:
+                metrics.incr("messages.decoded.%s" % self.kls.identifier)
+                self._message = self.kls.from_dict(self.data)
+        return self._message
+
+    def serialize(self, wire_format=WIRE_FORMAT_MAP):
+        if self.raw is not None and BaseMessage.wire_format_of(self.raw) == wire_format:
+            return self.raw
+        return self.message.serialize(wire_format)
+
+    def to_dict(self):
+        if self._message is None and self.data is not None:
+            return self.data
+        return self.message.to_dict()
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.message, name)
+
+
 class BaseRequestMessage(BaseMessage):
 
+    compact_fields = (("request_id", FIELD_RAW), ("address", FIELD_HEX))
+
     def __init__(self, address, request_id=None):
         """
         :param address: sender address
@@ -459,18 +834,35 @@ class BaseRequestMessage(BaseMessage):
 
 
 class HelloMessage(BaseRequestMessage):
+    """Handshake message. Advertises wire formats, compression codecs and protocol features supported by
+    the node, peers that don't send them support only map wire format without compression and features."""
 
     identifier = "HEY"
 
+    compact_fields = BaseRequestMessage.compact_fields + (("wire_formats", FIELD_RAW), ("codecs", FIELD_RAW),
+                                                          ("features", FIELD_RAW))
+
+    def __init__(self, address, request_id=None, wire_formats=(WIRE_FORMAT_MAP,), codecs=(), features=()):
+        super().__init__(address, request_id)
+        self.wire_formats = list(wire_formats)
+        self.codecs = list(codecs)
+        self.features = list(features)
+
     def to_dict(self):
         return {
             "request_id": self.request_id,
             "address": self.address,
+            "wire_formats": self.wire_formats,
+            "codecs": self.codecs,
+            "features": self.features,
         }
 
     @classmethod
     def from_dict(cls, data):
-        return HelloMessage(data["address"], data["request_id"])
+        return cls(data["address"], data["request_id"],
+                   wire_formats=data.get("wire_formats") or (WIRE_FORMAT_MAP,),
+                   codecs=data.get("codecs") or (),
+                   features=data.get("features") or ())
 
 
 class HelloAckMessage(HelloMessage):
@@ -481,6 +873,8 @@ class RequestBlockHeight(BaseRequestMessage):
 
     identifier = "RBH"
 
+    compact_fields = BaseRequestMessage.compact_fields + (("block_number", FIELD_RAW),)
+
     def __init__(self, block_number, address, request_id=None):
         super().__init__(address, request_id)
         self.block_number = block_number
@@ -502,48 +896,102 @@ class ResponseBlockHeight(RequestBlockHeight):
 
 
 class RequestBlockList(BaseRequestMessage):
+    """Requests blocks starting from the block number. Peer responds with at most `count` blocks, or
+    with every block up to its head if count is missing."""
 
     identifier = "RBL"
 
-    def __init__(self, start_from_block, address, request_id=None):
+    compact_fields = BaseRequestMessage.compact_fields + (("start_from_block", FIELD_RAW), ("count", FIELD_RAW))
+
+    def __init__(self, start_from_block, address, request_id=None, count=None):
         super().__init__(address, request_id)
         self.start_from_block = start_from_block
+        self.count = count
 
     def to_dict(self):
         return {
             "request_id": self.request_id,
             "start_from_block": self.start_from_block,
-            "address": self.address
+            "address": self.address,
+            "count": self.count,
         }
 
     @classmethod
     def from_dict(self, data):
-        return RequestBlockList(data["start_from_block"], data["address"], data["request_id"])
+        return RequestBlockList(data["start_from_block"], data["address"], data["request_id"],
+                                count=data.get("count"))
+
+
+class RequestBlockHeaders(RequestBlockList):
+    """Requests headers of blocks starting from the block number, see `RequestBlockList`."""
+
+    identifier = "RBR"
+
+    @classmethod
+    def from_dict(cls, data):
+        return RequestBlockHeaders(data["start_from_block"], data["address"], data["request_id"],
+                                   count=data.get("count"))
+
+
+class ResponseBlockHeaders(BaseRequestMessage):
+    """Responds with block headers, see `Block.header`."""
+
+    identifier = "ABR"
+
+    # headers are embedded as serialized blocks without transactions
+    compact_fields = BaseRequestMessage.compact_fields + (("headers", FIELD_RAW),)
+
+    def __init__(self, headers, address, request_id=None):
+        """
+        :param headers: headers, serialized headers or their dict representations
+        :type headers: list[any]
+        :param address:
+        :param request_id:
+        """
+        super().__init__(address, request_id)
+        self.headers = [LazyMessage.wrap(header, Block) for header in headers or []]
+
+    def to_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "headers": [header.to_dict() for header in self.headers]}
+
+    def compact_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "headers": [header.serialize(WIRE_FORMAT_COMPACT) for header in self.headers]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return ResponseBlockHeaders(data["headers"], data["address"], data["request_id"])
 
 
 class ResponseBlockList(BaseRequestMessage):
     identifier = "ABL"
 
+    # blocks are embedded as serialized blocks, so they are decoded only once accessed
+    compact_fields = BaseRequestMessage.compact_fields + (("blocks", FIELD_RAW),)
+
     def __init__(self, blocks, address, request_id=None):
         """
-        :param blocks:
+        :param blocks: blocks, serialized blocks or their dict representations
         :type blocks: list[any]
         :param address:
         :param request_id:
         """
         super().__init__(address, request_id)
-        if blocks:
-            if isinstance(blocks[0], bytes):
-                blocks = [Block.deserialize(b) for b in blocks]
-            elif isinstance(blocks[0], dict):
-                blocks = [Block.from_dict(b) for b in blocks]
-        self.blocks = blocks
+        self.blocks = [LazyMessage.wrap(blk, Block) for blk in blocks or []]
 
     def to_dict(self):
         return {"request_id": self.request_id,
                 "address": self.address,
                 "blocks": [blk.to_dict() for blk in self.blocks],}
 
+    def compact_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "blocks": [blk.serialize() for blk in self.blocks],}
+
     @classmethod
     def from_dict(cls, data):
         return ResponseBlockList(data["blocks"],
@@ -551,6 +999,166 @@ class ResponseBlockList(BaseRequestMessage):
                                  data["request_id"])
 
 
+class InventoryMessage(BaseRequestMessage):
+    """Announces ids of transactions and blocks, see `ccoin.inventory`."""
+
+    identifier = "INV"
+
+    compact_fields = BaseRequestMessage.compact_fields + (("items", FIELD_RAW),)
+
+    def __init__(self, items, address, request_id=None):
+        """
+        :param items: list of [message identifier, message id] pairs
+        :type items: list[list[str]]
+        :param address:
+        :param request_id:
+        """
+        super().__init__(address, request_id)
+        self.items = [list(item) for item in items]
+
+    def to_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "items": self.items}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["items"], data["address"], data["request_id"])
+
+
+class GetDataMessage(InventoryMessage):
+    """Requests full transactions and blocks announced by inventory message."""
+
+    identifier = "GDT"
+
+
+class CompactBlockMessage(BaseRequestMessage):
+    """Relays block as its header and short ids of its transactions, see `ccoin.compact_block`."""
+
+    identifier = "CBK"
+
+    # header is embedded as serialized block without transactions, short ids are concatenated
+    compact_fields = BaseRequestMessage.compact_fields + (("header", FIELD_RAW), ("salt", FIELD_HEX),
+                                                          ("short_ids", FIELD_RAW))
+
+    # bytes of short transaction id
+    SHORT_ID_LENGTH = 6
+
+    def __init__(self, header, salt, short_ids, address, request_id=None):
+        """
+        :param header: block header, serialized header or its dict representation
+        :type header: any
+        :param salt: hex encoded salt of short transaction ids
+        :type salt: str
+        :param short_ids: hex encoded short ids of block transactions in block order
+        :type short_ids: list[str]
+        :param address:
+        :param request_id:
+        """
+        super().__init__(address, request_id)
+        self.header = LazyMessage.wrap(header, Block)
+        self.salt = salt
+        self.short_ids = list(short_ids)
+
+    @property
+    def id(self):
+        return self.header.id
+
+    def to_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "header": self.header.to_dict(),
+                "salt": self.salt,
+                "short_ids": self.short_ids}
+
+    def compact_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "header": self.header.serialize(WIRE_FORMAT_COMPACT),
+                "salt": self.salt,
+                "short_ids": binascii.unhexlify("".join(self.short_ids))}
+
+    @classmethod
+    def unpack_compact(cls, values):
+        data = super().unpack_compact(values)
+        raw_ids, size = data["short_ids"] or b"", cls.SHORT_ID_LENGTH
+        data["short_ids"] = [binascii.hexlify(raw_ids[i:i + size]).decode() for i in range(0, len(raw_ids), size)]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return CompactBlockMessage(data["header"], data["salt"], data["short_ids"], data["address"],
+                                   data["request_id"])
+
+
+class GetBlockTransactionsMessage(BaseRequestMessage):
+    """Requests transactions of compact block which are missing from the node's transaction queue."""
+
+    identifier = "GBT"
+
+    compact_fields = BaseRequestMessage.compact_fields + (("block_id", FIELD_HEX), ("indexes", FIELD_RAW))
+
+    def __init__(self, block_id, indexes, address, request_id=None):
+        """
+        :param block_id: block id
+        :type block_id: str
+        :param indexes: positions of missing transactions in the block
+        :type indexes: list[int]
+        :param address:
+        :param request_id:
+        """
+        super().__init__(address, request_id)
+        self.block_id = block_id
+        self.indexes = list(indexes)
+
+    def to_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "block_id": self.block_id,
+                "indexes": self.indexes}
+
+    @classmethod
+    def from_dict(cls, data):
+        return GetBlockTransactionsMessage(data["block_id"], data["indexes"], data["address"], data["request_id"])
+
+
+class BlockTransactionsMessage(BaseRequestMessage):
+    """Responds with requested transactions of compact block."""
+
+    identifier = "BTX"
+
+    compact_fields = BaseRequestMessage.compact_fields + (("block_id", FIELD_HEX), ("indexes", FIELD_RAW),
+                                                          ("txns", FIELD_TXNS))
+
+    def __init__(self, block_id, indexes, txns, address, request_id=None):
+        """
+        :param block_id: block id
+        :type block_id: str
+        :param indexes: positions of transactions in the block
+        :type indexes: list[int]
+        :param txns: transactions or their dict representations
+        :type txns: list[Transaction|dict]
+        :param address:
+        :param request_id:
+        """
+        super().__init__(address, request_id)
+        self.block_id = block_id
+        self.indexes = list(indexes)
+        self.txns = [Transaction.from_dict(txn) if isinstance(txn, dict) else txn for txn in txns]
+
+    def to_dict(self):
+        return {"request_id": self.request_id,
+                "address": self.address,
+                "block_id": self.block_id,
+                "indexes": self.indexes,
+                "txns": [txn.to_dict() for txn in self.txns]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return BlockTransactionsMessage(data["block_id"], data["indexes"], data["txns"], data["address"],
+                                        data["request_id"])
+
+
 class LeaderRequestMessage(BaseRequestMessage):
     identifier = "LDR"
 
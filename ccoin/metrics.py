@@ -0,0 +1,37 @@
+from collections import Counter
+
+
+class Metrics(object):
+    """Node-wide counters and timings exposed to node operators.
+
+    Attributes:
+        counters (Counter): maps counter name to its value
+        timings (dict): maps timing name to tuple of (count, total seconds, max seconds)
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.timings = {}
+
+    def incr(self, name, value=1):
+        self.counters[name] += value
+
+    def observe(self, name, seconds):
+        count, total, max_seconds = self.timings.get(name, (0, 0.0, 0.0))
+        self.timings[name] = (count + 1, total + seconds, max(max_seconds, seconds))
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+
+    def to_dict(self):
+        timings = {}
+        for name, (count, total, max_seconds) in self.timings.items():
+            timings[name] = {"count": count,
+                             "total": total,
+                             "avg": total / count,
+                             "max": max_seconds}
+        return {"counters": dict(self.counters), "timings": timings}
+
+
+metrics = Metrics()
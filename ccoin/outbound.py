@@ -0,0 +1,121 @@
+"""Per-connection outbound scheduling.
+
+Frames are written to the transport directly while it keeps up. Once transport's write buffer is full, it pauses
+the scheduler (see `twisted.internet.interfaces.IPushProducer`) and frames wait in per-priority queues: control
+messages (handshake, leader election, requests, inventory), blocks and transactions. Once the transport is drained,
+queued frames are written in priority order, so that control traffic isn't stuck behind large block responses.
+
+Each priority class has a limit of queued bytes. Frames over the limit mean that the peer can't keep up, so it's
+disconnected. Transactions aren't dropped either, since received transactions aren't relayed further and the peer
+would never learn about them.
+"""
+from collections import deque
+
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implementer
+
+from ccoin.messages import Transaction, Block, GenesisBlock, ResponseBlockList, ResponseBlockHeaders, \
+    CompactBlockMessage, BlockTransactionsMessage
+from ccoin.metrics import metrics
+
+PRIORITIES = (PRIORITY_CONTROL, PRIORITY_BLOCKS, PRIORITY_TRANSACTIONS) = ("control", "blocks", "transactions")
+
+# maps message identifier to its priority class, the rest are control messages
+MESSAGE_PRIORITIES = {
+    Block.identifier: PRIORITY_BLOCKS,
+    GenesisBlock.identifier: PRIORITY_BLOCKS,
+    ResponseBlockList.identifier: PRIORITY_BLOCKS,
+    ResponseBlockHeaders.identifier: PRIORITY_BLOCKS,
+    CompactBlockMessage.identifier: PRIORITY_BLOCKS,
+    BlockTransactionsMessage.identifier: PRIORITY_BLOCKS,
+    Transaction.identifier: PRIORITY_TRANSACTIONS,
+}
+
+
+def message_priority(msg_type):
+    """
+    :param msg_type: message identifier
+    :type msg_type: str
+    :return: priority class of the message
+    :rtype: str
+    """
+    return MESSAGE_PRIORITIES.get(msg_type, PRIORITY_CONTROL)
+
+
+@implementer(IPushProducer)
+class OutboundScheduler(object):
+    """Writes frames of a single connection in priority order while the transport keeps up.
+
+    Attributes:
+        queues (dict): maps priority class to deque of queued frames
+        queued_bytes (dict): maps priority class to number of queued bytes
+        paused (bool): whether the transport asked to stop writing
+        stopped (bool): whether the connection is closed
+    """
+
+    def __init__(self, write, max_bytes, on_overflow):
+        """
+        :param write: writes frame to the transport
+        :type write: callable
+        :param max_bytes: maps priority class to max number of queued bytes
+        :type max_bytes: dict
+        :param on_overflow: called with priority class once its queue is over the limit
+        :type on_overflow: callable
+        """
+        self.write = write
+        self.max_bytes = max_bytes
+        self.on_overflow = on_overflow
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        self.queued_bytes = dict.fromkeys(PRIORITIES, 0)
+        self.paused = False
+        self.stopped = False
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def send(self, frame, priority=PRIORITY_CONTROL):
+        """
+        Writes frame or queues it until the transport is drained.
+        :param frame: serialized message
+        :type frame: bytes
+        :param priority: priority class, one of PRIORITIES
+        :type priority: str
+        :return: whether frame is written or queued
+        :rtype: bool
+        """
+        if self.stopped:
+            return False
+        if not self.paused and not len(self):
+            self.write(frame)
+            return True
+        if self.queued_bytes[priority] + len(frame) > self.max_bytes[priority]:
+            metrics.incr("outbound.dropped.%s" % priority)
+            self.on_overflow(priority)
+            return False
+        self.queues[priority].append(frame)
+        self.queued_bytes[priority] += len(frame)
+        metrics.incr("outbound.queued.%s" % priority)
+        return True
+
+    def flush(self):
+        """Writes queued frames in priority order until the transport pauses again."""
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            while queue and not self.paused and not self.stopped:
+                frame = queue.popleft()
+                self.queued_bytes[priority] -= len(frame)
+                self.write(frame)
+
+    def pauseProducing(self):
+        self.paused = True
+        metrics.incr("outbound.paused")
+
+    def resumeProducing(self):
+        self.paused = False
+        self.flush()
+
+    def stopProducing(self):
+        self.stopped = True
+        for priority in PRIORITIES:
+            self.queues[priority].clear()
+            self.queued_bytes[priority] = 0
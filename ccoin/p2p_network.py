@@ -12,13 +12,23 @@ from twisted.python import log
 from twisted.web.client import Agent
 
 from ccoin import settings
+from ccoin.admission import TransactionAdmission
 from ccoin.app_conf import AppConfig
 from ccoin.base import DeferredRequestMixin
+from ccoin.compact_block import FEATURE_COMPACT_BLOCKS, make_compact_block
+from ccoin.compression import CODECS, is_compressed, decompress_frame
 from ccoin.exceptions import NotSupportedMessage
+from ccoin.inventory import FEATURE_INVENTORY, RelayStore, inventory_key
+from ccoin.metrics import metrics
+from ccoin.outbound import OutboundScheduler, PRIORITY_CONTROL, message_priority
 from ccoin.messages import Transaction, HelloMessage, HelloAckMessage, RequestBlockHeight, ResponseBlockHeight, \
-    RequestBlockList, ResponseBlockList, Block, LeaderRequestMessage, LeaderResponseMessage
+    RequestBlockList, ResponseBlockList, Block, LeaderRequestMessage, LeaderResponseMessage, InventoryMessage, \
+    GetDataMessage, RequestBlockHeaders, ResponseBlockHeaders, CompactBlockMessage, GetBlockTransactionsMessage, \
+    BlockTransactionsMessage, WIRE_FORMATS, WIRE_FORMAT_MAP, decode_message
 from ccoin.peer_info import PeerInfo
 from ccoin.rest_api import run_http_api
+from ccoin.seen_cache import SeenCache
+from ccoin.sync import FEATURE_HEADERS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -34,6 +44,12 @@ class SimpleHandshakeProtocol(IntNStringReceiver, DeferredRequestMixin):
             among connections.
         node_id (str): Unique id of the node on this side of the connection.
         peer_node_id (str): Unique id of the node on the other side of the connection.
+        wire_format (int): Wire format of outgoing messages negotiated during handshake.
+        codec (str): Compression codec of outgoing messages negotiated during handshake, None if disabled.
+        features (set[str]): Protocol features supported by both sides negotiated during handshake.
+        known_inventory (SeenCache): keys of gossiped messages the peer is known to have.
+        pending_inventory (list): inventory waiting to be announced to the peer.
+        outbound (OutboundScheduler): writes outgoing messages in priority order as the transport drains.
     """
 
 
@@ -41,6 +57,7 @@ class SimpleHandshakeProtocol(IntNStringReceiver, DeferredRequestMixin):
     structFormat = '<I'
     prefixLength = struct.calcsize(structFormat)
     MAX_LENGTH = 3000000  # max message size to 3MB
+    MAX_DECOMPRESSED_LENGTH = 10 * MAX_LENGTH  # max size of compressed message once decompressed
 
     def __init__(self, factory):
         """
@@ -51,34 +68,64 @@ class SimpleHandshakeProtocol(IntNStringReceiver, DeferredRequestMixin):
         self.factory = factory
         self.node_id = str(self.factory.id)
         self.peer_node_id = None
+        self.wire_format = WIRE_FORMAT_MAP
+        self.codec = None
+        self.features = set()
+        inventory = AppConfig["inventory"]
+        self.known_inventory = SeenCache(inventory["known_size"], inventory["ttl"])
+        self.pending_inventory = []
+        self.delayed_announce = None
+        self.outbound = OutboundScheduler(self.sendString, AppConfig["outbound"]["max_bytes"],
+                                          self.on_outbound_overflow)
 
     def connectionMade(self):
         """Callback called once a connection with another node got established."""
         logger.debug('Connected to %s.', str(self.transport.getPeer()))
+        # transport pauses the scheduler once its write buffer is full
+        self.transport.registerProducer(self.outbound, True)
 
     def connectionLost(self, reason=connectionDone):
         """Callback called once a connection with another node got lost."""
         logger.debug('Lost connection to %s with id %s: %s',
                      str(self.transport.getPeer()), self.peer_node_id, reason.getErrorMessage())
 
+        if self.delayed_announce is not None and self.delayed_announce.active():
+            self.delayed_announce.cancel()
+        self.outbound.stopProducing()
         # remove peer_node_id from peers
         if self.peer_node_id is not None and self.peer_node_id in self.factory.peers_connection:
             self.factory.remove_peer(self.peer_node_id)
 
+    # maps handshake message type to its handler name
+    handshake_handlers = {
+        HelloMessage.identifier: "handle_hi",
+        HelloAckMessage.identifier: "handle_hi_ack",
+    }
+
+    def decode_frame(self, string):
+        """Restores original frame of compressed message. Compressed frames are accepted regardless
+        of negotiated codec, since they are self-describing."""
+        if is_compressed(string):
+            log.msg("DECOMPRESSING MSG: %s (%s bytes)" % (string[:3].decode(), len(string)))
+            return decompress_frame(string, self.MAX_DECOMPRESSED_LENGTH)
+        return string
+
     def stringReceived(self, string):
         """Callback called once a complete message is received"""
+        self.frame_received(self.decode_frame(string))
+
+    def frame_received(self, string):
+        """
+        Handles received message.
+        :param string: frame restored by `decode_frame`
+        :type string: bytes
+        """
         msg_type = string[:3].decode()
-        log.msg("RECEIVED MSG: %s" % string)
-        if msg_type == "HEY":
-            msg = HelloMessage.deserialize(string)
-            # handle handshake
-            self.handle_hi(msg)
-        elif msg_type == "ACK":
-            msg = HelloAckMessage.deserialize(string)
-            # handle handshake acknowledgement
-            self.handle_hi_ack(msg)
-        else:
+        log.msg("RECEIVED MSG: %s (%s bytes)" % (msg_type, len(string)))
+        handler_name = self.handshake_handlers.get(msg_type)
+        if handler_name is None:
             raise NotSupportedMessage(msg_type)
+        getattr(self, handler_name)(decode_message(string))
 
     def handle_hi(self, msg):
         """Handles incoming handshake message by persisting the details of connected peer and
@@ -89,6 +136,9 @@ class SimpleHandshakeProtocol(IntNStringReceiver, DeferredRequestMixin):
             self.factory.add_peer(peer_node_id, self)
             self.peer_node_id = peer_node_id
         self.send_hi_ack(msg.request_id)
+        self.negotiate_wire_format(msg.wire_formats)
+        self.negotiate_codec(msg.codecs)
+        self.negotiate_features(msg.features)
 
     def handle_hi_ack(self, msg):
         """Handles incoming handshake acknowledgement message by persisting the details of acknowledging peer."""
@@ -97,13 +147,116 @@ class SimpleHandshakeProtocol(IntNStringReceiver, DeferredRequestMixin):
         if peer_node_id not in self.factory.peers_connection:
             self.factory.add_peer(peer_node_id, self)
             self.peer_node_id = peer_node_id
+        self.negotiate_wire_format(msg.wire_formats)
+        self.negotiate_codec(msg.codecs)
+        self.negotiate_features(msg.features)
         # Trigger deferred callbacks
         self.receive_response(msg)
 
         # TODO define ping reconnecting loop
 
+    def negotiate_wire_format(self, peer_wire_formats):
+        """Selects the most recent wire format supported by both sides. Decoding doesn't depend on it,
+        because every message is self-describing, so each side switches independently."""
+        common = set(WIRE_FORMATS) & set(peer_wire_formats)
+        self.wire_format = max(common) if common else WIRE_FORMAT_MAP
+        logger.debug('Negotiated wire format %s with peer_node_id = %s', self.wire_format, self.peer_node_id)
+
+    def negotiate_codec(self, peer_codecs):
+        """Selects compression codec supported by both sides, unless compression is disabled."""
+        common = [codec for codec in self.supported_codecs() if codec in peer_codecs]
+        self.codec = common[0] if common else None
+        logger.debug('Negotiated compression codec %s with peer_node_id = %s', self.codec, self.peer_node_id)
+
+    @staticmethod
+    def supported_codecs():
+        """
+        :return: compression codecs advertised at handshake, most preferred first
+        :rtype: tuple
+        """
+        return CODECS if AppConfig["compression"]["enabled"] else ()
+
+    def negotiate_features(self, peer_features):
+        """Enables protocol features supported by both sides."""
+        self.features = set(self.supported_features()) & set(peer_features)
+        logger.debug('Negotiated features %s with peer_node_id = %s', self.features, self.peer_node_id)
+
+    @staticmethod
+    def supported_features():
+        """
+        :return: protocol features advertised at handshake
+        :rtype: tuple
+        """
+        features = []
+        if AppConfig["inventory"]["enabled"]:
+            features.append(FEATURE_INVENTORY)
+        if AppConfig["sync"]["headers_first"]:
+            features.append(FEATURE_HEADERS)
+        if AppConfig["compact_blocks"]["enabled"]:
+            features.append(FEATURE_COMPACT_BLOCKS)
+        return tuple(features)
+
+    def knows(self, key):
+        """
+        :param key: gossiped message key, see `ccoin.inventory.inventory_key`
+        :type key: bytes
+        :return: whether peer is known to have the message
+        :rtype: bool
+        """
+        return key in self.known_inventory
+
+    def mark_known(self, key):
+        self.known_inventory.add(key)
+
+    def announce(self, msg_type, msg_id, key):
+        """
+        Announces gossiped message to the peer, announcements are accumulated for a short delay and sent
+        with single inventory message.
+        :param msg_type: message identifier
+        :type msg_type: str
+        :param msg_id: message id
+        :type msg_id: str
+        :param key: message key
+        :type key: bytes
+        """
+        if self.knows(key):
+            return
+        self.mark_known(key)
+        self.pending_inventory.append([msg_type, msg_id])
+        if self.delayed_announce is None or not self.delayed_announce.active():
+            self.delayed_announce = reactor.callLater(AppConfig["inventory"]["announce_delay"],
+                                                      self.flush_inventory)
+
+    def flush_inventory(self):
+        if not self.pending_inventory:
+            return
+        items, self.pending_inventory = self.pending_inventory, []
+        metrics.incr("inventory.announced", len(items))
+        self.send_message(InventoryMessage(items, self.node_id))
+
+    def send_message(self, msg):
+        """
+        Sends message encoded with the negotiated wire format. Messages above compression threshold
+        are compressed with the negotiated codec.
+        :param msg: message instance
+        :type msg: ccoin.messages.BaseMessage
+        """
+        frame = msg.serialize(self.wire_format)
+        compression = AppConfig["compression"]
+        if self.codec is not None and len(frame) >= compression["threshold"]:
+            frame = msg.serialize_compressed(self.wire_format, compression["level"])
+        self.outbound.send(frame, message_priority(msg.identifier))
+
+    def on_outbound_overflow(self, priority):
+        """Disconnects the peer which doesn't keep up with outgoing messages."""
+        log.msg("Peer %s doesn't keep up with %s messages, disconnecting" % (self.peer_node_id, priority))
+        metrics.incr("outbound.disconnects")
+        self.outbound.stopProducing()
+        self.transport.abortConnection()
+
     def send_hi(self):
-        hi_msg = HelloMessage(self.node_id)
+        hi_msg = HelloMessage(self.node_id, wire_formats=WIRE_FORMATS, codecs=self.supported_codecs(),
+                              features=self.supported_features())
         d = self.send_request(self.peer_node_id, hi_msg, raise_on_timeout=True)
         return d
 
@@ -113,8 +266,10 @@ class SimpleHandshakeProtocol(IntNStringReceiver, DeferredRequestMixin):
         :return: deferred object
         :rtype: defer.Deferred
         """
-        ack_msg = HelloAckMessage(self.node_id, request_id=request_id)
-        self.sendString(ack_msg.serialize())
+        ack_msg = HelloAckMessage(self.node_id, request_id=request_id, wire_formats=WIRE_FORMATS,
+                                  codecs=self.supported_codecs(), features=self.supported_features())
+        # handshake messages are always sent in map wire format understood by all peers
+        self.outbound.send(ack_msg.serialize(), PRIORITY_CONTROL)
 
     def get_connections(self):
         return {self.peer_node_id: self}
@@ -122,11 +277,20 @@ class SimpleHandshakeProtocol(IntNStringReceiver, DeferredRequestMixin):
 
 class BasePeerConnection(SimpleHandshakeProtocol):
 
-    def stringReceived(self, string):
+    def frame_received(self, string):
+        key = self.factory.gossip_key(string)
+        if key is not None and self.factory.is_seen(key):
+            # the peer has the message, so it's never announced back
+            self.mark_known(key)
+            log.msg("DROPPED DUPLICATE MSG: %s (%s bytes)" % (string[:3].decode(), len(string)))
+            return
         try:
-            super(BasePeerConnection, self).stringReceived(string)
+            super(BasePeerConnection, self).frame_received(string)
         except NotSupportedMessage as exc:
-            self.factory.message_callback(exc.msg_type, string, self)
+            accepted = self.factory.message_callback(exc.msg_type, string, self)
+            if key is not None and accepted:
+                # batched transactions are remembered once the batch is admitted
+                self.factory.remember_gossip(key, self)
 
 
 class DiscoveryServiceClient(object):
@@ -182,6 +346,11 @@ class BasePeer(Factory, DeferredRequestMixin):
         id (int): unique identifier of this factory which represents a node.
         peers (dict): stores for each node id a peer instance with ip and port information.
         reconnect_loop (LoopingCall): keeps trying to connect to peers if connection to at least one is lost.
+        seen_messages (SeenCache): keys of recently accepted gossip messages.
+        relay_store (RelayStore): messages announced with inventory protocol and received transactions, served once
+            peers request them.
+        requested_inventory (SeenCache): keys of announced messages requested recently.
+        txn_admission (TransactionAdmission): batches incoming transactions, None if they are admitted one by one.
 
     """
 
@@ -194,6 +363,18 @@ class BasePeer(Factory, DeferredRequestMixin):
         self.discovery_service = DiscoveryServiceClient()
         self.message_callback = self.parse_msg
         self.reconnect_loop = None
+        seen_cache = AppConfig["seen_cache"]
+        self.seen_messages = SeenCache(seen_cache["max_size"], seen_cache["ttl"],
+                                       bloom_bits=seen_cache["bloom_bits"])
+        inventory = AppConfig["inventory"]
+        self.relay_store = RelayStore(inventory["relay_store_size"])
+        self.requested_inventory = SeenCache(inventory["known_size"], inventory["request_timeout"])
+        admission = AppConfig["admission"]
+        self.txn_admission = None
+        if admission["enabled"]:
+            self.txn_admission = TransactionAdmission(self.receive_transactions, admission["window"],
+                                                      admission["max_batch"],
+                                                      on_accepted=self.on_transaction_admitted)
 
     @property
     def peer(self):
@@ -220,6 +401,8 @@ class BasePeer(Factory, DeferredRequestMixin):
         logger.debug('Peer not online (%s): peer node id = %s ', str(failure.type), node_id)
 
     def disconnect(self):
+        if self.txn_admission is not None:
+            self.txn_admission.flush()
         d = self.discovery_service.remove_member(self.id)
         log.msg("Disconnecting Factory and releasing resources")
         return d
@@ -297,53 +480,192 @@ class BasePeer(Factory, DeferredRequestMixin):
         :param msg_object: Message instance (Transaction, Block, etc.)
         :type msg_object: Message
         """
-        msg_bytes = msg_object.serialize()
-        include_self = False
+        key = None
+        compact_block = None
+        if self.peers_connection:
+            # the node handles its own message first
+            self.message_callback(msg_object.identifier, msg_object.serialize(), None)
+        if msg_object.identifier in self.gossip_messages and msg_object.id is not None:
+            key = self.relay_store.add(msg_object)
+            self.remember_gossip(key)
+            if msg_object.identifier == Block.identifier:
+                # encoded once for all peers, missing transactions are served from the relay store
+                compact_block = make_compact_block(msg_object, self.id)
         for peer_id, peer_conn in self.peers_connection.items():
-            peer_conn.sendString(msg_bytes)
-            if not include_self:
-                peer_conn.stringReceived(msg_bytes)
-                include_self = True
+            if compact_block is not None and FEATURE_COMPACT_BLOCKS in peer_conn.features:
+                peer_conn.mark_known(key)
+                peer_conn.send_message(compact_block)
+            elif key is not None and FEATURE_INVENTORY in peer_conn.features:
+                peer_conn.announce(msg_object.identifier, msg_object.id, key)
+            else:
+                # message is encoded once per wire format
+                peer_conn.send_message(msg_object)
 
     def send(self, peer_address, msg_object, msg_type):
         if peer_address in self.peers_connection:
-            self.peers_connection[peer_address].sendString(msg_object.serialize())
+            self.peers_connection[peer_address].send_message(msg_object)
 
-    def parse_msg(self, msg_type, msg, sender):
-        if msg_type == "RBH":
-            obj = RequestBlockHeight.deserialize(msg)
-            self.receive_block_height_request(obj, sender)
-            return
-        if msg_type == "BLH":
-            obj = ResponseBlockHeight.deserialize(msg)
-            self.receive_block_height_response(obj, sender)
-            return
-        elif msg_type == "TXN":
-            obj = Transaction.deserialize(msg)
-            self.receive_transaction(obj)
-            return
-        elif msg_type == "RBL":
-            obj = RequestBlockList.deserialize(msg)
-            self.receive_request_blocks(obj, sender)
-            return
-        elif msg_type == "ABL":
-            obj = ResponseBlockList.deserialize(msg)
-            self.receive_response_blocks(obj, sender)
+    # messages gossiped to every peer, duplicates of accepted ones are dropped before decoding
+    gossip_messages = {
+        Transaction.identifier: Transaction,
+        Block.identifier: Block,
+    }
+
+    def gossip_key(self, msg):
+        """
+        Identifies gossiped message by its id, the same key in any wire format, see `ccoin.inventory.inventory_key`.
+        :param msg: serialized message
+        :type msg: bytes
+        :return: message key, None if message isn't gossiped or is malformed
+        :rtype: bytes | None
+        """
+        msg_type = msg[:3].decode()
+        kls = self.gossip_messages.get(msg_type)
+        if kls is None:
             return
-        elif msg_type == "BLK":
-            obj = Block.deserialize(msg)
-            self.receive_block(obj)
+        try:
+            msg_id = kls.peek_id(msg)
+        except Exception:
+            # left to the handler to reject
             return
-        elif msg_type == "LDR":
-            obj = LeaderRequestMessage.deserialize(msg)
-            self.receive_leader_election_request(obj, sender)
+        if msg_id is None:
             return
-        elif msg_type == "ADR":
-            obj = LeaderResponseMessage.deserialize(msg)
-            self.receive_leader_election_response(obj, sender)
+        return inventory_key(msg_type, msg_id)
+
+    def is_seen(self, key):
+        """
+        Tells whether gossiped message has been already accepted.
+        :param key: message key, see `gossip_key`
+        :type key: bytes
+        :rtype: bool
+        """
+        if key not in self.seen_messages:
+            return False
+        metrics.incr("gossip.duplicates.%s" % key[:3].decode())
+        return True
+
+    def remember_gossip(self, key, sender=None):
+        """
+        Remembers gossiped message once it's accepted, so that its duplicates are dropped. Keys are recorded
+        only for messages that decoded and were accepted by their handler, so malformed or invalid frames
+        never shadow the valid message.
+        :param key: message key, see `gossip_key`
+        :type key: bytes
+        :param sender: connection of the peer which sent the message
+        :type sender: BasePeerConnection
+        """
+        self.seen_messages.add(key)
+        if sender is not None:
+            sender.mark_known(key)
+
+    def on_transaction_admitted(self, transaction, senders):
+        """
+        Remembers transaction accepted by the admission batch.
+        :param transaction: accepted transaction
+        :type transaction: Transaction
+        :param senders: connections of the peers which sent the transaction
+        :type senders: list[BasePeerConnection]
+        """
+        key = inventory_key(transaction.identifier, transaction.id)
+        self.remember_gossip(key)
+        for sender in senders:
+            if sender is not None:
+                sender.mark_known(key)
+
+    def find_inventory(self, msg_type, msg_id):
+        """
+        :param msg_type: message identifier
+        :type msg_type: str
+        :param msg_id: message id
+        :type msg_id: str
+        :return: message to serve to peers, None if node doesn't have it
+        :rtype: ccoin.messages.BaseMessage | None
+        """
+        return self.relay_store.get(inventory_key(msg_type, msg_id))
+
+    def receive_inventory(self, msg, sender):
+        """
+        Requests announced messages the node doesn't have and hasn't requested from other peers recently.
+        :param msg: inventory message
+        :type msg: InventoryMessage
+        :param sender: announcing peer connection
+        :type sender: BasePeerConnection
+        """
+        wanted = []
+        for msg_type, msg_id in msg.items:
+            if msg_type not in self.gossip_messages:
+                continue
+            key = inventory_key(msg_type, msg_id)
+            sender.mark_known(key)
+            if key in self.seen_messages or self.find_inventory(msg_type, msg_id) is not None:
+                continue
+            if not self.requested_inventory.add(key):
+                continue
+            wanted.append([msg_type, msg_id])
+        if wanted:
+            metrics.incr("inventory.requested", len(wanted))
+            sender.send_message(GetDataMessage(wanted, self.id))
+
+    def receive_get_data(self, msg, sender):
+        """
+        Serves requested messages.
+        :param msg: get data message
+        :type msg: GetDataMessage
+        :param sender: requesting peer connection
+        :type sender: BasePeerConnection
+        """
+        for msg_type, msg_id in msg.items:
+            message = self.find_inventory(msg_type, msg_id)
+            if message is None:
+                metrics.incr("inventory.missing")
+                continue
+            metrics.incr("inventory.served")
+            sender.mark_known(inventory_key(msg_type, msg_id))
+            sender.send_message(message)
+
+    # maps message type to tuple of (handler name, whether handler receives sender connection)
+    message_handlers = {
+        RequestBlockHeight.identifier: ("receive_block_height_request", True),
+        ResponseBlockHeight.identifier: ("receive_block_height_response", True),
+        Transaction.identifier: ("receive_transaction", False),
+        RequestBlockList.identifier: ("receive_request_blocks", True),
+        ResponseBlockList.identifier: ("receive_response_blocks", True),
+        RequestBlockHeaders.identifier: ("receive_request_headers", True),
+        ResponseBlockHeaders.identifier: ("receive_response_headers", True),
+        Block.identifier: ("receive_block", False),
+        LeaderRequestMessage.identifier: ("receive_leader_election_request", True),
+        LeaderResponseMessage.identifier: ("receive_leader_election_response", True),
+        InventoryMessage.identifier: ("receive_inventory", True),
+        GetDataMessage.identifier: ("receive_get_data", True),
+        CompactBlockMessage.identifier: ("receive_compact_block", True),
+        GetBlockTransactionsMessage.identifier: ("receive_get_block_transactions", True),
+        BlockTransactionsMessage.identifier: ("receive_block_transactions", True),
+    }
+
+    def parse_msg(self, msg_type, msg, sender):
+        """
+        Decodes message and hands it over to its handler.
+        :param msg_type: message identifier
+        :type msg_type: str
+        :param msg: serialized message
+        :type msg: bytes
+        :param sender: connection of the peer which sent the message, None for node's own message
+        :type sender: BasePeerConnection
+        :return: result of the handler, whether gossiped message is accepted
+        """
+        try:
+            handler_name, with_sender = self.message_handlers[msg_type]
+        except KeyError:
+            raise NotImplementedError("Can\'t parse %s: %s bytes" % (msg_type, len(msg)))
+        if msg_type == Transaction.identifier and self.txn_admission is not None:
+            # transactions are decoded and verified in batches
+            self.txn_admission.submit(msg, sender)
             return
-        else:
-            raise NotImplementedError("Can\'t parse %s: %s" % (msg_type, msg))
+        obj = decode_message(msg)
+        handler = getattr(self, handler_name)
+        if with_sender:
+            return handler(obj, sender)
+        return handler(obj)
 
     @abstractmethod
     def receive_block_height_request(self, request_block_height, sender):
@@ -386,11 +708,66 @@ class BasePeer(Factory, DeferredRequestMixin):
         """
         pass
 
+    @abstractmethod
+    def receive_request_headers(self, request_headers, sender):
+        """
+        Handles download block headers request
+        :param request_headers:
+        :param sender:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def receive_response_headers(self, response_headers, sender):
+        """
+        Handles download block headers response.
+        :param response_headers:
+        :param sender:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def receive_compact_block(self, compact_block, sender):
+        """
+        Handles compact block, see `ccoin.compact_block`.
+        :param compact_block:
+        :param sender:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def receive_get_block_transactions(self, request, sender):
+        """
+        Serves transactions of relayed block missing from the peer.
+        :param request:
+        :param sender:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def receive_block_transactions(self, response, sender):
+        """
+        Handles transactions missing from compact block.
+        :param response:
+        :param sender:
+        :return:
+        """
+        pass
+
     @abstractmethod
     def receive_transaction(self, transaction):
         """Handles new transaction."""
         pass
 
+    @abstractmethod
+    def receive_transactions(self, transactions):
+        """Handles burst of new transactions."""
+        pass
+
     @abstractmethod
     def receive_block(self, block):
         """Handles new block."""
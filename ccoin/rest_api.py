@@ -74,6 +74,30 @@ class TransactionManageResource(JSONP2PRelayResource):
             return txn and txn.to_dict() or None
 
 
+class MetricsResource(JSONP2PRelayResource):
+    # metrics/
+    isLeaf = True
+
+    def render_GET(self, request):
+        return self.node.get_metrics()
+
+
+class AccountNonceResource(JSONP2PRelayResource):
+    # nonce/<address>/
+    isLeaf = False
+
+    address = None
+
+    def getChild(self, path, request):
+        if path:
+            self.address = path.decode()
+        return self
+
+    def render_GET(self, request):
+        assert self.address is not None, "Pass account address parameter"
+        return self.node.get_account_nonce(self.address)
+
+
 class BlockManageResource(JSONP2PRelayResource):
     isLeaf = False
 
@@ -87,17 +111,42 @@ class BlockManageResource(JSONP2PRelayResource):
 
 class BlockInfoResource(JSONP2PRelayResource):
     # blk/1/
-    isLeaf = True
+    isLeaf = False
 
     def __init__(self, node, block_number):
         super().__init__(node)
         self.block_number = block_number
 
+    def getChild(self, path, request):
+        if path == b'proof':
+            return TransactionProofResource(self.node, self.block_number)
+        return self
+
     def render_GET(self, request):
         block_data = self.node.get_block_info(self.block_number)
         return block_data and block_data or None
 
 
+class TransactionProofResource(JSONP2PRelayResource):
+    # blk/1/proof/<txn_id>/
+    isLeaf = False
+
+    txn_id = None
+
+    def __init__(self, node, block_number):
+        super().__init__(node)
+        self.block_number = block_number
+
+    def getChild(self, path, request):
+        if path:
+            self.txn_id = path.decode()
+        return self
+
+    def render_GET(self, request):
+        assert self.txn_id is not None, "Pass transaction id parameter"
+        return self.node.get_txn_proof(self.txn_id, self.block_number)
+
+
 class BlockCountResource(JSONP2PRelayResource):
     # blk/cnt/
     isLeaf = True
@@ -113,6 +162,8 @@ def run_http_api(node, port, callback=None, errback=None):
     # manage transaction resource
     node_resource.putChild(b"txn", TransactionManageResource())
     node_resource.putChild(b"blk", BlockManageResource())
+    node_resource.putChild(b"metrics", MetricsResource())
+    node_resource.putChild(b"nonce", AccountNonceResource())
 
     site = server.Site(RestApi)
 
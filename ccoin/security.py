@@ -2,8 +2,13 @@
 import msgpack
 import base64
 import binascii
+import threading
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
-from cryptography.hazmat.primitives.asymmetric import utils
+from functools import lru_cache
+from cryptography.hazmat.primitives.asymmetric import utils, ed25519
 from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
@@ -11,6 +16,21 @@ from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
 
 from ccoin import settings
+from ccoin.app_conf import AppConfig
+from ccoin.exceptions import UnknownSignatureScheme
+
+DEFAULT_SIGNATURE_SCHEME = "rsa"
+
+# hex-encoded "-----BEGIN PUBLIC KEY-----"
+PEM_HEX_PREFIX = "2d2d2d2d2d424547494e205055424c4943204b45592d2d2d2d2d"
+
+PUBLIC_KEY_CACHE_SIZE = 4096
+
+ADDRESS_LENGTH = 40
+
+PSS_PADDING = padding.PSS(
+    mgf=padding.MGF1(hashes.SHA256()),
+    salt_length=padding.PSS.MAX_LENGTH)
 
 
 def generate_private_key(public_exponent, key_size, backend):
@@ -18,66 +38,330 @@ def generate_private_key(public_exponent, key_size, backend):
     with patch("cryptography.hazmat.primitives.asymmetric.rsa._verify_rsa_parameters", return_value=None):
         return backend.generate_rsa_private_key(public_exponent=public_exponent, key_size=key_size)
 
-def generate_key_pair(key_size=1024):
-    """Generates private/public RSA key pair and returns them hex-encoded"""
-    private_key = generate_private_key(public_exponent=17, key_size=key_size, backend=default_backend())
 
-    private_key_pem = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=serialization.NoEncryption()
-    )
-    private_key_hex = binascii.hexlify(private_key_pem)
+class SignatureScheme(metaclass=ABCMeta):
+    """Defines how account keys are generated and (de)serialized, how messages are signed and verified
+    and how account address is derived from public key. Keys are kept hex-encoded, signatures base64-encoded."""
+
+    name = None
+
+    @abstractmethod
+    def generate_key_pair(self):
+        """Generates private/public key pair and returns them hex-encoded"""
+        pass
+
+    @abstractmethod
+    def load_private_key(self, private_hex):
+        """Parses hex-encoded private key and returns private key object"""
+        pass
+
+    @abstractmethod
+    def load_public_key(self, public_hex):
+        """Parses hex-encoded public key and returns public key object"""
+        pass
+
+    @abstractmethod
+    def is_public_key(self, public_hex):
+        """Returns flag whether hex-encoded public key belongs to this scheme"""
+        pass
+
+    @abstractmethod
+    def address(self, public_hex):
+        """Derives 40-char account address from hex-encoded public key"""
+        pass
+
+    @abstractmethod
+    def sign_bytes(self, private_key, message_bytes):
+        pass
+
+    @abstractmethod
+    def verify_bytes(self, public_key, signature, message_bytes):
+        pass
+
+    def sign(self, private_key, message_bytes):
+        """
+        Signs message_bytes.
+        :param private_key: private key object returned by `load_private_key` or hex-encoded private key
+        :param message_bytes: message to be signed
+        :type message_bytes: bytes
+        :return: base64 encoded signature
+        :rtype: str
+        """
+        if isinstance(private_key, (str, bytes)):
+            private_key = self.load_private_key(private_key)
+        signature = self.sign_bytes(private_key, message_bytes)
+        return base64.b64encode(signature).decode('ascii')
+
+    def verify(self, base64_signature, message_bytes, public_hex):
+        """Verifies base64 encoded signature of message_bytes with hex-encoded public key"""
+        try:
+            public_key = self.load_public_key(public_hex)
+            signature = base64.b64decode(base64_signature.encode('ascii'))
+        except (ValueError, TypeError):
+            return False
+        try:
+            self.verify_bytes(public_key, signature, message_bytes)
+        except InvalidSignature:
+            return False
+        else:
+            return True
+
+
+class RSASignatureScheme(SignatureScheme):
+    """RSA keys with PEM encoding and PSS padded signatures."""
+
+    name = "rsa"
+
+    def __init__(self, key_size=1024):
+        self.key_size = key_size
+        self.load_public_key = lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)(self.load_public_key)
+
+    def generate_key_pair(self):
+        private_key = generate_private_key(public_exponent=17, key_size=self.key_size, backend=default_backend())
+
+        private_key_pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        private_key_hex = binascii.hexlify(private_key_pem)
+
+        public_key = private_key.public_key()
+        public_key_pem = public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        public_key_hex = binascii.hexlify(public_key_pem)
+        return private_key_hex.decode(), public_key_hex.decode()
+
+    def load_private_key(self, private_hex):
+        private_bytes = binascii.unhexlify(private_hex)
+        private_key = serialization.load_pem_private_key(
+            private_bytes, password=None, backend=default_backend())
+        return private_key
+
+    def load_public_key(self, public_hex):
+        public_bytes = binascii.unhexlify(public_hex)
+        return serialization.load_pem_public_key(public_bytes, backend=default_backend())
+
+    def is_public_key(self, public_hex):
+        return public_hex.startswith(PEM_HEX_PREFIX)
+
+    def address(self, public_hex):
+        return public_hex[115:155]
+
+    def sign_bytes(self, private_key, message_bytes):
+        digest = hash_message(message_bytes, hex=False)
+        return private_key.sign(digest, PSS_PADDING, utils.Prehashed(hashes.SHA256()))
+
+    def verify_bytes(self, public_key, signature, message_bytes):
+        digest = hash_message(message_bytes, hex=False)
+        public_key.verify(signature, digest, PSS_PADDING, utils.Prehashed(hashes.SHA256()))
+
+
+class Ed25519SignatureScheme(SignatureScheme):
+    """Ed25519 keys with raw encoding (32-byte keys) and 64-byte signatures.
+    Address is the tail of SHA-256 hash of raw public key."""
+
+    name = "ed25519"
+
+    KEY_HEX_LENGTH = 64
+
+    def __init__(self):
+        self.load_public_key = lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)(self.load_public_key)
+
+    def generate_key_pair(self):
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        private_bytes = private_key.private_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PrivateFormat.Raw,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        public_bytes = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
+        )
+        return binascii.hexlify(private_bytes).decode(), binascii.hexlify(public_bytes).decode()
+
+    def load_private_key(self, private_hex):
+        return ed25519.Ed25519PrivateKey.from_private_bytes(binascii.unhexlify(private_hex))
+
+    def load_public_key(self, public_hex):
+        return ed25519.Ed25519PublicKey.from_public_bytes(binascii.unhexlify(public_hex))
+
+    def is_public_key(self, public_hex):
+        return len(public_hex) == self.KEY_HEX_LENGTH
+
+    def address(self, public_hex):
+        return hash_message(binascii.unhexlify(public_hex))[-40:]
+
+    def sign_bytes(self, private_key, message_bytes):
+        return private_key.sign(message_bytes)
 
-    public_key = private_key.public_key()
-    public_key_pem = public_key.public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo
-    )
-    public_key_hex = binascii.hexlify(public_key_pem)
-    return private_key_hex.decode(), public_key_hex.decode()
+    def verify_bytes(self, public_key, signature, message_bytes):
+        public_key.verify(signature, message_bytes)
 
 
-def load_private_key_from_file(key_path):
+signature_schemes = {
+    RSASignatureScheme.name: RSASignatureScheme(),
+    Ed25519SignatureScheme.name: Ed25519SignatureScheme(),
+}
+
+
+def get_signature_scheme(name=DEFAULT_SIGNATURE_SCHEME):
+    """
+    :param name: signature scheme name
+    :type name: str
+    :rtype: SignatureScheme
+    :raises: UnknownSignatureScheme
+    """
+    try:
+        return signature_schemes[name]
+    except KeyError:
+        raise UnknownSignatureScheme(name)
+
+
+def detect_signature_scheme(public_hex):
+    """
+    Returns signature scheme the hex-encoded public key belongs to.
+    :rtype: SignatureScheme
+    :raises: UnknownSignatureScheme
+    """
+    for scheme in signature_schemes.values():
+        if scheme.is_public_key(public_hex):
+            return scheme
+    raise UnknownSignatureScheme(public_hex)
+
+
+def public_key_address(public_hex):
+    """Derives account address from hex-encoded public key of any supported scheme"""
+    return detect_signature_scheme(public_hex).address(public_hex)
+
+
+def is_address(key_or_address):
+    """Returns flag whether the value is account address rather than hex-encoded public key"""
+    return key_or_address is not None and len(key_or_address) == ADDRESS_LENGTH
+
+
+def to_address(key_or_address):
+    """Returns account address referenced either by address itself or by hex-encoded public key"""
+    if is_address(key_or_address):
+        return key_or_address
+    return public_key_address(key_or_address)
+
+
+def generate_key_pair(scheme=DEFAULT_SIGNATURE_SCHEME):
+    """Generates private/public key pair and returns them hex-encoded"""
+    return get_signature_scheme(scheme).generate_key_pair()
+
+
+def load_private_key_from_file(key_path, scheme=DEFAULT_SIGNATURE_SCHEME):
     with open(key_path, "rb") as fh:
-        return binascii.unhexlify(load_private_key(fh.read()))
-
-
-def load_private_key(private_hex):
-    private_bytes = binascii.unhexlify(private_hex)
-    private_key = serialization.load_pem_private_key(
-        private_bytes, password=None, backend=default_backend())
-    return private_key
-
-
-def sign(private_hex, message_bytes):
-    """Sign message_bytes with RSA cryptography tools"""
-    digest = hash_message(message_bytes, hex=False)
-    private_bytes = binascii.unhexlify(private_hex)
-    private_key = serialization.load_pem_private_key(
-        private_bytes, password=None, backend=default_backend())
-    pad = padding.PSS(
-        mgf=padding.MGF1(hashes.SHA256()),
-        salt_length=padding.PSS.MAX_LENGTH)
-    signature = private_key.sign(digest, pad, utils.Prehashed(hashes.SHA256()))
-    return base64.b64encode(signature).decode('ascii')
-
-
-def verify(base64_signature, message_bytes, public_hex):
-    """Verifies signature with RSA cryptography tools"""
-    public_bytes = binascii.unhexlify(public_hex)
-    public_key = serialization.load_pem_public_key(public_bytes, backend=default_backend())
-    signature = base64.b64decode(base64_signature.encode('ascii'))
-    digest = hash_message(message_bytes, hex=False)
-    pad = padding.PSS(
-        mgf=padding.MGF1(hashes.SHA256()),
-        salt_length=padding.PSS.MAX_LENGTH)
+        return load_private_key(fh.read(), scheme=scheme)
+
+
+def load_private_key(private_hex, scheme=DEFAULT_SIGNATURE_SCHEME):
+    """Parses hex-encoded private key and returns private key object"""
+    return get_signature_scheme(scheme).load_private_key(private_hex)
+
+
+def sign(private_key, message_bytes, scheme=DEFAULT_SIGNATURE_SCHEME):
+    """Sign message_bytes with the given signature scheme.
+    :param private_key: private key object returned by `load_private_key` or hex-encoded private key
+    :param message_bytes: message to be signed
+    :type message_bytes: bytes
+    :return: base64 encoded signature
+    :rtype: str
+    """
+    return get_signature_scheme(scheme).sign(private_key, message_bytes)
+
+
+def verify(base64_signature, message_bytes, public_hex, scheme=DEFAULT_SIGNATURE_SCHEME):
+    """Verifies signature with the given signature scheme"""
+    return get_signature_scheme(scheme).verify(base64_signature, message_bytes, public_hex)
+
+
+class SignatureCache(object):
+    """Bounded LRU cache of successfully verified signatures.
+    Keys are (transaction id, digest of signature and signed message) pairs, so cached entry
+    can't be reused by transaction with tampered content or signature."""
+
+    def __init__(self, max_size=None):
+        """
+        :param max_size: max number of cached signatures, defaults to `signature_cache_size` application setting
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(txid, base64_signature, message_bytes):
+        return txid, hash_message(base64_signature.encode('ascii') + message_bytes, hex=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return False
+            self.entries.move_to_end(key)
+            return True
+
+    def add(self, key):
+        max_size = self.max_size or AppConfig["signature_cache_size"]
+        with self.lock:
+            self.entries[key] = True
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+verified_signatures = SignatureCache()
+
+_verify_pool = None
+
+
+def get_verify_pool():
+    """Returns thread pool used to verify signatures in parallel.
+    Pool size is configured with `signature_verify_workers` application setting."""
+    global _verify_pool
+    if _verify_pool is None:
+        _verify_pool = ThreadPoolExecutor(max_workers=AppConfig["signature_verify_workers"],
+                                          thread_name_prefix="ccoin-verify")
+    return _verify_pool
+
+
+def _verify_one(transaction):
     try:
-        public_key.verify(signature, digest, pad, utils.Prehashed(hashes.SHA256()))
-    except InvalidSignature:
-        return False
-    else:
-        return True
+        transaction.verify()
+    except Exception as exc:
+        return exc
+
+
+def verify_many(transactions, pool=None):
+    """
+    Verifies signatures of transactions concurrently. Signature checks release the GIL,
+    so they are fanned out over thread pool.
+    :param transactions: list of transactions (objects with `verify` method)
+    :type transactions: list[ccoin.messages.Transaction]
+    :param pool: executor to run verification on, defaults to shared verification thread pool
+    :type pool: concurrent.futures.Executor
+    :return: per-transaction results in the input order: None if transaction is verified or
+        exception raised by its verification otherwise
+    :rtype: list[Exception|None]
+    """
+    transactions = list(transactions)
+    if len(transactions) < 2:
+        return [_verify_one(txn) for txn in transactions]
+    if pool is None:
+        pool = get_verify_pool()
+    return list(pool.map(_verify_one, transactions))
 
 
 def hash_message(message_bytes, hex=True):
@@ -0,0 +1,103 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class BloomFilter(object):
+    """Fixed size Bloom filter of byte strings. It may report false positives, but never false negatives."""
+
+    def __init__(self, bits, hashes=4):
+        """
+        :param bits: filter size in bits
+        :type bits: int
+        :param hashes: number of bit positions per key
+        :type hashes: int
+        """
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray((bits + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=4 * self.hashes).digest()
+        for i in range(0, len(digest), 4):
+            yield int.from_bytes(digest[i:i + 4], "little") % self.bits
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.array[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class SeenCache(object):
+    """Bounded cache of recently seen keys, e.g. ids of gossiped transactions and blocks.
+
+    Keys are forgotten once they are older than ttl or once the cache exceeds max_size, the oldest first.
+    Optional Bloom filter in front of the cache answers most lookups of unseen keys without touching
+    the cache. Filter can't forget keys, so two generations of filters are kept and rotated every ttl.
+
+    Attributes:
+        entries (OrderedDict): maps key to the time it was seen, the oldest first
+    """
+
+    def __init__(self, max_size, ttl, bloom_bits=0):
+        """
+        :param max_size: max number of remembered keys
+        :type max_size: int
+        :param ttl: seconds the key is remembered for
+        :type ttl: int
+        :param bloom_bits: size of Bloom filter in bits, filter is disabled if 0
+        :type bloom_bits: int
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.bloom_bits = bloom_bits
+        self.entries = OrderedDict()
+        self.blooms = None
+        self.bloom_rotated_at = time.time()
+        if bloom_bits:
+            self.blooms = [BloomFilter(bloom_bits), BloomFilter(bloom_bits)]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        now = time.time()
+        self.expire(now)
+        if self.blooms is not None and not any(key in bloom for bloom in self.blooms):
+            return False
+        return key in self.entries
+
+    def expire(self, now):
+        deadline = now - self.ttl
+        while self.entries:
+            key, seen_at = next(iter(self.entries.items()))
+            if seen_at > deadline:
+                break
+            self.entries.popitem(last=False)
+        if self.blooms is not None and now - self.bloom_rotated_at >= self.ttl:
+            self.blooms = [BloomFilter(self.bloom_bits), self.blooms[0]]
+            self.bloom_rotated_at = now
+
+    def add(self, key):
+        """
+        Remembers the key.
+        :param key: key
+        :type key: bytes
+        :return: False if the key has been already seen
+        :rtype: bool
+        """
+        if key in self:
+            return False
+        self.entries[key] = time.time()
+        if self.blooms is not None:
+            self.blooms[0].add(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return True
+
+    def clear(self):
+        self.entries.clear()
+        if self.blooms is not None:
+            self.blooms = [BloomFilter(self.bloom_bits), BloomFilter(self.bloom_bits)]
@@ -2,8 +2,17 @@ NODE_STATES = (GENESIS_STATE, BOOT_STATE, READY_STATE, STOPPING, DEAD, ) = ("g",
 BLANK_SHA_256 = "0000000000000000000000000000000000000000000000000000000000000000"
 GENESIS_BLOCK_NUMBER = 1
 
+# Transaction root versions, selected by "txns_root_version" of genesis block mining config:
+#   1. hash of message pack of all transaction ids
+#   2. root of binary Merkle tree of transaction ids, see ccoin.merkle
+TXNS_ROOT_VERSIONS = (TXNS_ROOT_LIST, TXNS_ROOT_MERKLE) = (1, 2)
+
 DEFAULT_REQUEST_TIMEOUT = 5  # seconds
 
+# blocks on top of the block that registered account's public key before account's transactions reference it
+# by address, so that peers lagging behind still resolve the key
+KEY_REGISTRATION_CONFIRMATIONS = 6
+
 NEW_BLOCK_INTERVAL_CHECK = 5 # 5 seconds
 
 HTTP_REQUEST_TIMEOUT = 4
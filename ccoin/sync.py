@@ -0,0 +1,331 @@
+import time
+from collections import deque
+
+from twisted.internet import defer
+from twisted.python import log
+
+from ccoin.exceptions import BlockHeadersMissing
+from ccoin.messages import RequestBlockList, RequestBlockHeaders
+from ccoin.metrics import metrics
+
+FEATURE_HEADERS = "hdr1"
+
+
+class HeaderSync(object):
+    """Downloads and validates header chain before block bodies are downloaded.
+
+    Headers are requested in batches from the peer that reported the best height and each header is validated
+    against its parent (linkage, timestamp, number, difficulty and proof of work), so that the node never
+    downloads block bodies of an invalid chain. Peer which sends invalid header chain or doesn't provide
+    headers it reported is marked bad and headers are downloaded from the next best peer.
+
+    Attributes:
+        heights (dict): maps peer address to its reported block height, peers support headers download
+        bad_peers (set[str]): peers which sent invalid header chain
+        headers (dict): maps block number to block id of the validated header chain
+    """
+
+    def __init__(self, node, heights, batch=2000, timeout=10):
+        """
+        :param node: syncing node
+        :type node: ccoin.chainnode.ChainNode
+        :param heights: maps peer address to its reported block height
+        :type heights: dict
+        :param batch: number of headers requested at once
+        :type batch: int
+        :param timeout: seconds to wait for a batch
+        :type timeout: int
+        """
+        self.node = node
+        self.heights = dict(heights)
+        self.batch = batch
+        self.timeout = timeout
+        self.bad_peers = set()
+        self.headers = {}
+
+    @property
+    def height(self):
+        """Height of the validated header chain."""
+        return max(self.headers) if self.headers else self.node.chain.height
+
+    @defer.inlineCallbacks
+    def start(self):
+        """
+        :return: deferred fired with the validated header chain, see `headers`
+        :rtype: twisted.internet.defer.Deferred
+        """
+        started = time.time()
+        for address in sorted(self.heights, key=self.heights.get, reverse=True):
+            if address not in self.node.peers_connection:
+                continue
+            try:
+                self.headers = yield self.download(address)
+            except Exception as ex:
+                log.msg("Failed to sync headers from %s: %s" % (address, ex))
+                metrics.incr("sync.bad_peers")
+                self.bad_peers.add(address)
+                continue
+            break
+        metrics.observe("sync.headers_duration", time.time() - started)
+        log.msg("Header sync finished at height=%s" % self.height)
+        defer.returnValue(self.headers)
+
+    @defer.inlineCallbacks
+    def download(self, address):
+        """
+        Downloads and validates headers the peer reported.
+        :param address: peer address
+        :type address: str
+        :return: maps block number to block id
+        :rtype: dict
+        :raises: BlockApplyException, BlockHeadersMissing
+        """
+        chain = self.node.chain
+        parent = chain.head if chain.height else None
+        genesis_block = chain.genesis_block
+        target = self.heights[address]
+        headers = {}
+        number = chain.height + 1
+        while number <= target:
+            count = min(self.batch, target - number + 1)
+            msg = RequestBlockHeaders(number, self.node.id, count=count)
+            response = yield self.node.send_request(address, msg, timeout=self.timeout, raise_on_timeout=True)
+            if not response.headers:
+                raise BlockHeadersMissing(address, number)
+            for lazy_header in response.headers[:count]:
+                header = lazy_header.message
+                chain.validate_header(header, parent, genesis_block=genesis_block)
+                if parent is None:
+                    # difficulty of the following headers is checked against downloaded genesis block
+                    genesis_block = header
+                headers[header.number] = header.id
+                parent = header
+            metrics.incr("sync.headers_downloaded", min(count, len(response.headers)))
+            number = parent.number + 1
+        log.msg("Validated headers %s..%s from %s" % (chain.height + 1, target, address))
+        defer.returnValue(headers)
+
+
+class BlockSync(object):
+    """Downloads blocks up to the best height reported by peers.
+
+    Blocks are requested in fixed-size windows from every peer that reported height covering the window,
+    so windows are downloaded in parallel. Windows may arrive out of order, they are buffered and applied
+    in block number order. Peer may return less blocks than requested, e.g. to fit its response into
+    the frame size limit, then the rest of the window is requested again. Window that times out is
+    requested from another peer, peer is dropped once it fails `max_retries` times. If the header chain was
+    validated beforehand (see `HeaderSync`), downloaded blocks must match validated headers, otherwise the window
+    is treated as failed. Once no remaining peer has the next window, the target is lowered to the best height
+    of the remaining peers.
+
+    Attributes:
+        heights (dict): maps peer address to its reported block height
+        target (int): block height the sync is going to reach
+        pending (collections.deque): (start, count) windows waiting to be requested
+        in_flight (dict): maps window start to tuple of (peer address, count)
+        buffered (dict): maps window start to tuple of (peer address, downloaded blocks)
+        failures (dict): maps peer address to number of its failed requests
+        headers (dict): maps block number to block id of the validated header chain, None if not validated
+        done (twisted.internet.defer.Deferred): fired with the chain height once the sync is over
+    """
+
+    def __init__(self, node, heights, window=64, max_in_flight=2, timeout=10, max_retries=3, headers=None):
+        """
+        :param node: syncing node
+        :type node: ccoin.chainnode.ChainNode
+        :param heights: maps peer address to its reported block height
+        :type heights: dict
+        :param window: number of blocks requested at once
+        :type window: int
+        :param max_in_flight: max number of windows requested from a peer at once
+        :type max_in_flight: int
+        :param timeout: seconds to wait for a window
+        :type timeout: int
+        :param max_retries: number of failed requests peer is dropped after
+        :type max_retries: int
+        :param headers: maps block number to block id of the validated header chain
+        :type headers: dict
+        """
+        self.node = node
+        self.heights = dict(heights)
+        self.window = window
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.headers = headers
+        self.target = max(self.heights.values()) if self.heights else node.chain.height
+        self.pending = deque()
+        self.in_flight = {}
+        self.buffered = {}
+        self.failures = {}
+        self.started = None
+        self.done = defer.Deferred()
+
+    @property
+    def next_number(self):
+        return self.node.chain.height + 1
+
+    def start(self):
+        """
+        :return: deferred fired with the chain height once the sync is over
+        :rtype: twisted.internet.defer.Deferred
+        """
+        self.started = time.time()
+        for start in range(self.next_number, self.target + 1, self.window):
+            self.pending.append((start, min(self.window, self.target - start + 1)))
+        log.msg("Syncing blocks %s..%s from %s peers" % (self.next_number, self.target, len(self.heights)))
+        self.schedule()
+        return self.done
+
+    def peer_in_flight(self, address):
+        return sum(1 for peer, _ in self.in_flight.values() if peer == address)
+
+    def pick_peer(self, start, count):
+        """Picks peer that has the whole window and the least requests in flight."""
+        candidates = [address for address, height in self.heights.items()
+                      if height >= start + count - 1 and address in self.node.peers_connection
+                      and self.peer_in_flight(address) < self.max_in_flight]
+        if not candidates:
+            return
+        return min(candidates, key=self.peer_in_flight)
+
+    def schedule(self):
+        """Requests pending windows from idle peers and finishes the sync once nothing is left to do."""
+        self.drop_disconnected()
+        while True:
+            while self.pending:
+                start, count = self.pending[0]
+                address = self.pick_peer(start, count)
+                if address is None:
+                    break
+                self.pending.popleft()
+                self.request(address, start, count)
+            if self.in_flight or not self.pending:
+                break
+            # nothing is in flight and no remaining peer has the next window
+            self.lower_target(max(self.heights.values(), default=self.node.chain.height))
+        if not self.in_flight and not self.pending:
+            self.finish()
+
+    def drop_disconnected(self):
+        for address in [address for address in self.heights if address not in self.node.peers_connection]:
+            log.msg("Peer %s disconnected, stop syncing from it" % address)
+            self.heights.pop(address)
+
+    def lower_target(self, height):
+        """
+        Cuts pending windows down to the height.
+        :param height: best height of the remaining peers
+        :type height: int
+        """
+        log.msg("No peer has blocks %s..%s, sync target lowered to %s" % (height + 1, self.target, height))
+        metrics.incr("sync.target_lowered")
+        self.target = height
+        self.pending = deque((start, min(count, height - start + 1)) for start, count in self.pending
+                             if start <= height)
+
+    def request(self, address, start, count):
+        self.in_flight[start] = (address, count)
+        msg = RequestBlockList(start, self.node.id, count=count)
+        d = self.node.send_request(address, msg, timeout=self.timeout, raise_on_timeout=True)
+        d.addCallbacks(self.on_window, self.on_window_failed,
+                       callbackArgs=(address, start, count), errbackArgs=(address, start, count))
+
+    def on_window(self, response, address, start, count):
+        self.in_flight.pop(start, None)
+        if self.done.called:
+            return
+        # peers that don't support count return every block they have
+        blocks = response.blocks[:count]
+        if not blocks:
+            return self.on_window_failed(None, address, start, count)
+        try:
+            valid = self.matches_window(start, blocks)
+        except Exception as ex:
+            log.msg("Malformed blocks %s..%s from %s: %s" % (start, start + count - 1, address, ex))
+            valid = False
+        if not valid:
+            log.msg("Blocks %s..%s from %s don't match the requested window" % (start, start + count - 1, address))
+            return self.on_window_failed(None, address, start, count)
+        self.buffered[start] = (address, blocks)
+        if len(blocks) < count:
+            # the rest of the window didn't fit into the response
+            self.pending.appendleft((start + len(blocks), count - len(blocks)))
+        metrics.incr("sync.blocks_downloaded", len(blocks))
+        self.apply_buffered()
+        self.schedule()
+
+    def on_window_failed(self, failure, address, start, count):
+        self.in_flight.pop(start, None)
+        if self.done.called:
+            return
+        if failure is not None:
+            log.msg("Failed to download blocks %s..%s from %s: %s" % (start, start + count - 1, address,
+                                                                      failure.getErrorMessage()))
+        self.blame(address)
+        self.pending.appendleft((start, count))
+        self.schedule()
+
+    def blame(self, address):
+        """Counts failed request of the peer, peer is dropped once it fails `max_retries` times."""
+        metrics.incr("sync.retries")
+        self.failures[address] = self.failures.get(address, 0) + 1
+        if self.failures[address] >= self.max_retries:
+            log.msg("Stop syncing from %s" % address)
+            self.heights.pop(address, None)
+
+    def matches_window(self, start, blocks):
+        """
+        Checks that downloaded blocks are the requested ones, and match validated headers if any.
+        :raises: MessageDeserializationException or decoding error if block is malformed
+        """
+        for number, blk in enumerate(blocks, start):
+            if blk.number != number:
+                return False
+            if self.headers is not None and blk.id != self.headers.get(number):
+                return False
+        return True
+
+    def apply_buffered(self):
+        """Applies downloaded windows which follow the chain head. Window whose block fails to apply
+        is requested again from the block on, and the peer which sent it is blamed."""
+        height = self.node.chain.height
+        while self.buffered and min(self.buffered) <= self.next_number:
+            start = min(self.buffered)
+            address, blocks = self.buffered.pop(start)
+            for number, lazy_blk in enumerate(blocks, start):
+                if number < self.next_number:
+                    # already received with gossip
+                    continue
+                try:
+                    self.node.chain.apply_block(lazy_blk.message, worldstate=self.node.state)
+                except Exception as ex:
+                    log.msg("Block=%s from %s failed to apply: %s" % (number, address, ex))
+                    self.blame(address)
+                    self.pending.appendleft((number, start + len(blocks) - number))
+                    break
+        if self.node.chain.height > height:
+            metrics.incr("sync.blocks_applied", self.node.chain.height - height)
+            log.msg("Sync progress: %(height)s/%(target)s blocks (%(percent).1f%%)" % self.progress())
+
+    def finish(self):
+        if self.done.called:
+            return
+        metrics.observe("sync.duration", time.time() - self.started)
+        log.msg("Block sync finished at height=%s" % self.node.chain.height)
+        self.done.callback(self.node.chain.height)
+
+    def progress(self):
+        """
+        :return: sync progress
+        :rtype: dict
+        """
+        height = self.node.chain.height
+        return {
+            "height": height,
+            "target": self.target,
+            "percent": 100.0 * height / self.target if self.target else 100.0,
+            "peers": len(self.heights),
+            "in_flight": len(self.in_flight),
+            "buffered": sum(len(blocks) for _, blocks in self.buffered.values()),
+        }
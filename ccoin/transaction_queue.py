@@ -1,15 +1,24 @@
 import binascii
 import heapq
+import itertools
+import time
+
+from ccoin.exceptions import TransactionQueueChanged
+from ccoin.metrics import metrics
 
 
 class PriorityValue(object):
 
+    __slots__ = ()
+
     def __lt__(self, other):
         raise NotImplementedError("not implemented")
 
 
 class TransactionPriorityValue(PriorityValue):
 
+    __slots__ = ("address", "nonce")
+
     def __init__(self, address, nonce):
         self.address = address
         self.nonce = nonce
@@ -45,7 +54,10 @@ class TransactionPriorityValue(PriorityValue):
 
 
 class OrderableTransaction(object):
-    def __init__(self, prio, counter, tx):
+
+    __slots__ = ("prio", "counter", "tx", "added", "size")
+
+    def __init__(self, prio, counter, tx, added=None, size=0):
         """
         :param prio:
         :type: PriorityValue
@@ -53,10 +65,16 @@ class OrderableTransaction(object):
         :type counter:
         :param tx:
         :type tx: ccoin.messages.Transaction
+        :param added: timestamp the transaction was queued at
+        :type added: float
+        :param size: serialized size of the transaction
+        :type size: int
         """
         self.prio = prio
         self.counter = counter
         self.tx = tx
+        self.added = added
+        self.size = size
 
     def __lt__(self, other):
         if self.prio < other.prio:
@@ -70,25 +88,156 @@ class OrderableTransaction(object):
 
 class TransactionQueue():
 
-    """Implements priority queue of transactions where priority is defined by transaction time."""
+    """Implements priority queue of transactions where priority is defined by sender address and its nonce.
+
+    Pending transactions are also grouped per sender address and keyed by nonce, a sender can't have two
+    pending transactions with the same nonce. Sender's transactions are "ready" when their nonces make a
+    contiguous run right after sender's nonce in the world state, the rest are "future" transactions waiting
+    for the nonce gap to be filled.
+
+    Queue keeps index of transaction id to its queue entry, so that transactions are found and removed
+    in O(1). Removed entries stay in the heap as tombstones (entries without transaction) and are skipped on
+    pop. Heap is compacted once tombstones outnumber live entries.
 
-    def __init__(self):
+    Queue size may be limited by number of transactions, their total serialized size and number of
+    transactions per sender. Once the queue is full, the highest nonce transaction of the sender with
+    the most pending transactions is evicted. Transactions that stay under the queue longer than ttl
+    are dropped by `expire`.
+
+    Every change of the queue bumps its generation, see `snapshot`. Total amount of pending transactions is
+    kept per sender, see `ccoin.worldstate.PendingState`.
+    """
+
+    # heap isn't compacted while it holds less tombstones than that
+    COMPACT_MIN_TOMBSTONES = 1024
+
+    def __init__(self, max_transactions=None, max_bytes=None, max_per_sender=None, ttl=None):
+        """
+        :param max_transactions: max number of queued transactions, unlimited if None
+        :type max_transactions: int
+        :param max_bytes: max total serialized size of queued transactions, unlimited if None
+        :type max_bytes: int
+        :param max_per_sender: max number of queued transactions per sender, unlimited if None
+        :type max_per_sender: int
+        :param ttl: seconds transaction is kept under the queue, forever if None
+        :type ttl: int
+        """
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_per_sender = max_per_sender
+        self.ttl = ttl
         self.counter = 0
+        self.generation = 0
         self.txs = []
+        self.index = {}
+        self.senders = {}
+        # maps sender address to total amount of sender's pending transactions
+        self.spent = {}
+        self.tombstones = 0
+        self.bytes = 0
+        # maps number of sender's pending transactions to sender addresses, keeps eviction O(1)
+        self.sender_buckets = {}
+        self.max_sender_pending = 0
 
     def __len__(self):
-        return len(self.txs)
+        return len(self.txs) - self.tombstones
 
     def add_transaction(self, tx):
         """
         Add transaction to the place under the queue assigned by its prioirty.
         :param tx: transaction reference
         :type tx: ccoin.messages.Transaction
+        :return: False if the transaction or another sender's transaction with the same nonce is under the queue
+        :rtype: bool
         """
-        # Priority : the lower the timestamp the more higher position transaction has under the queue
-        prio = TransactionPriorityValue(tx.sender, tx.nonce)
-        heapq.heappush(self.txs, OrderableTransaction(prio, self.counter, tx))
+        address = tx.sender_address
+        pending = self.senders.get(address)
+        if tx.id in self.index or (pending and tx.nonce in pending):
+            return False
+        if pending and self.max_per_sender and len(pending) >= self.max_per_sender:
+            metrics.incr("mempool.rejected.sender_limit")
+            return False
+        prio = TransactionPriorityValue(address, tx.nonce)
+        entry = OrderableTransaction(prio, self.counter, tx, added=time.time(), size=self.tx_size(tx))
+        heapq.heappush(self.txs, entry)
+        self.index[tx.id] = entry
+        pending = self.senders.setdefault(address, {})
+        pending[tx.nonce] = entry
+        self.move_sender(address, len(pending) - 1, len(pending))
+        self.spent[address] = self.spent.get(address, 0) + (tx.amount or 0)
+        self.bytes += entry.size
         self.counter += 1
+        self.generation += 1
+        self.enforce_limits()
+        return tx.id in self.index
+
+    @staticmethod
+    def tx_size(tx):
+        # serialized without memoizing, queued transactions shouldn't hold their wire bytes
+        return len(tx._serialize())
+
+    def _unlink(self, entry):
+        """Removes queue entry from transaction id and sender indexes."""
+        self.generation += 1
+        del self.index[entry.tx.id]
+        address = entry.prio.address
+        pending = self.senders[address]
+        del pending[entry.prio.nonce]
+        self.move_sender(address, len(pending) + 1, len(pending))
+        self.spent[address] -= entry.tx.amount or 0
+        if not pending:
+            del self.senders[address]
+            del self.spent[address]
+        self.bytes -= entry.size
+
+    def move_sender(self, address, old_pending, new_pending):
+        """Moves sender between buckets of senders with the same number of pending transactions."""
+        if old_pending:
+            bucket = self.sender_buckets[old_pending]
+            bucket.discard(address)
+            if not bucket:
+                del self.sender_buckets[old_pending]
+        if new_pending:
+            self.sender_buckets.setdefault(new_pending, set()).add(address)
+        self.max_sender_pending = max(self.max_sender_pending, new_pending)
+        while self.max_sender_pending and self.max_sender_pending not in self.sender_buckets:
+            self.max_sender_pending -= 1
+
+    def is_full(self):
+        return bool((self.max_transactions and len(self) > self.max_transactions) or
+                    (self.max_bytes and self.bytes > self.max_bytes))
+
+    def enforce_limits(self):
+        """
+        Evicts transactions until queue fits its limits.
+        :return: number of evicted transactions
+        :rtype: int
+        """
+        evicted = 0
+        while self.is_full():
+            address = next(iter(self.sender_buckets[self.max_sender_pending]))
+            pending = self.senders[address]
+            evicted += self._remove_entries([pending[max(pending)]])
+        if evicted:
+            metrics.incr("mempool.evicted", evicted)
+        return evicted
+
+    def expire(self, now=None):
+        """
+        Drops transactions queued longer than ttl ago.
+        :param now: current timestamp
+        :type now: float
+        :return: number of expired transactions
+        :rtype: int
+        """
+        if not self.ttl:
+            return 0
+        deadline = (now or time.time()) - self.ttl
+        # index keeps transactions in arrival order
+        expired = list(itertools.takewhile(lambda entry: entry.added < deadline, self.index.values()))
+        if expired:
+            metrics.incr("mempool.expired", len(expired))
+        return self._remove_entries(expired)
 
     def pop_transaction(self):
         """
@@ -96,13 +245,128 @@ class TransactionQueue():
         :return: popped out transaction
         :rtype: ccoin.messages.Transaction
         """
-        try:
+        while self.txs:
             item = heapq.heappop(self.txs)
-        except IndexError:
-            return
-        else:
+            if item.tx is None:
+                self.tombstones -= 1
+                continue
+            self._unlink(item)
             return item.tx
 
+    def transactions(self):
+        """
+        :return: queued transactions in arrival order
+        :rtype: collections.Iterator[ccoin.messages.Transaction]
+        """
+        return (entry.tx for entry in self.index.values())
+
+    def get(self, txn_id):
+        """
+        :param txn_id: transaction id
+        :type txn_id: str
+        :return: queued transaction, None if it isn't under the queue
+        :rtype: ccoin.messages.Transaction | None
+        """
+        entry = self.index.get(txn_id)
+        if entry is not None:
+            return entry.tx
+
+    def contains(self, txn_id):
+        """
+        :param txn_id: transaction id
+        :type txn_id: str
+        :return: whether transaction is under the queue
+        :rtype: bool
+        """
+        return txn_id in self.index
+
+    def remove_many(self, txn_ids):
+        """
+        Removes transactions from the queue.
+        :param txn_ids: ids of transactions to remove, ids that aren't under the queue are ignored
+        :type txn_ids: collections.Iterable[str]
+        :return: number of removed transactions
+        :rtype: int
+        """
+        return self._remove_entries({self.index[txn_id] for txn_id in txn_ids if txn_id in self.index})
+
+    def remove_stale(self, address, nonce):
+        """
+        Removes sender's transactions which nonces are already used.
+        :param address: sender address
+        :type address: str
+        :param nonce: sender's nonce in the world state
+        :type nonce: int
+        :return: number of removed transactions
+        :rtype: int
+        """
+        pending = self.senders.get(address)
+        if not pending or nonce is None:
+            return 0
+        return self._remove_entries([entry for tx_nonce, entry in pending.items() if tx_nonce <= nonce])
+
+    def _remove_entries(self, entries):
+        for entry in entries:
+            self._unlink(entry)
+            entry.tx = None
+        self.tombstones += len(entries)
+        if self.tombstones > max(self.COMPACT_MIN_TOMBSTONES, len(self)):
+            self.compact()
+        return len(entries)
+
+    def compact(self):
+        """Drops tombstones from the heap."""
+        self.txs = [item for item in self.txs if item.tx is not None]
+        heapq.heapify(self.txs)
+        self.tombstones = 0
+
+    def iter_ready(self, nonce_lookup):
+        """
+        Iterates over ready transactions. Each sender's transactions are yielded in nonce order, senders are
+        interleaved by arrival order of their next transaction. Queue must not be changed while iterating.
+        :param nonce_lookup: returns sender's nonce in the world state by sender address, None if sender's
+            account doesn't exist
+        :type nonce_lookup: callable
+        :return: iterator of transactions
+        :rtype: collections.Iterator[ccoin.messages.Transaction]
+        """
+        heads = []
+        for address, pending in self.senders.items():
+            nonce = nonce_lookup(address)
+            if nonce is None:
+                continue
+            entry = pending.get(nonce + 1)
+            if entry is not None:
+                heads.append((entry.counter, address, nonce + 1))
+        heapq.heapify(heads)
+        while heads:
+            _, address, nonce = heapq.heappop(heads)
+            pending = self.senders[address]
+            yield pending[nonce].tx
+            entry = pending.get(nonce + 1)
+            if entry is not None:
+                heapq.heappush(heads, (entry.counter, address, nonce + 1))
+
+    def next_transaction(self, address, nonce):
+        """
+        :param address: sender address
+        :type address: str
+        :param nonce: sender's latest used nonce
+        :type nonce: int
+        :return: sender's queued transaction with the following nonce, None if it isn't queued
+        :rtype: ccoin.messages.Transaction | None
+        """
+        entry = self.senders.get(address, {}).get(nonce + 1)
+        if entry is not None:
+            return entry.tx
+
+    def snapshot(self):
+        """
+        Takes O(1) read-only snapshot of the queue, candidate block is started from it without copying the queue.
+        :rtype: TransactionQueueSnapshot
+        """
+        return TransactionQueueSnapshot(self)
+
     def peek(self, num=None):
         """
         Peeks the head slice ordered with priorities from the queue.
@@ -111,6 +375,8 @@ class TransactionQueue():
         :return: list of transactions
         :rtype: list[OrderableTransaction]
         """
+        if self.tombstones:
+            self.compact()
         if num:
             return self.txs[0:num]
         else:
@@ -124,16 +390,55 @@ class TransactionQueue():
         :return: reference to transaction queue
         :rtype: TransactionQueue
         """
-        remove_hashes = [tx.id for tx in txs]
-        keep = [item for item in self.txs if item.tx.id not in remove_hashes]
-        q = TransactionQueue()
-        q.txs = keep
-        return q
+        self.remove_many(tx.id for tx in txs)
+        return self
+
+
+class TransactionQueueSnapshot(object):
+    """Read-only view of the transaction queue. Snapshot shares transactions with the queue instead of
+    copying them, so it's valid until the queue changes.
+
+    Attributes:
+        queue (TransactionQueue): queue the snapshot is taken from
+        generation (int): generation of the queue at the time snapshot was taken
+    """
+
+    __slots__ = ("queue", "generation", "size")
+
+    def __init__(self, queue):
+        """
+        :param queue: transaction queue
+        :type queue: TransactionQueue
+        """
+        self.queue = queue
+        self.generation = queue.generation
+        self.size = len(queue)
+
+    def __len__(self):
+        return self.size
+
+    def check(self):
+        """
+        :raises TransactionQueueChanged: queue has changed since the snapshot was taken
+        """
+        if self.queue.generation != self.generation:
+            raise TransactionQueueChanged()
+
+    def iter_ready(self, nonce_lookup):
+        """
+        Iterates over ready transactions of the queue, see `TransactionQueue.iter_ready`.
+        :raises TransactionQueueChanged: queue has changed since the snapshot was taken
+        """
+        self.check()
+        for tx in self.queue.iter_ready(nonce_lookup):
+            yield tx
+            self.check()
 
 
 def make_test_tx(nonce=0, data='', amount=0, sender=b'\x35'):
     from ccoin.messages import Transaction
-    from_ = binascii.hexlify(sender * 20).decode()
+    # senders are referenced by 20-byte addresses
+    from_ = binascii.hexlify((sender * 20)[:20]).decode()
     to = binascii.hexlify(b'\x31' * 20).decode()
     tx = Transaction(from_=from_, to=to, number=nonce, amount=amount, data=data)
     tx.generate_id()
@@ -148,9 +453,8 @@ test()
     """
     q = TransactionQueue()
     params = [100000, 50000, 40000, 60000, 30000, 30000, 30000]
+    # transactions with the same sender and nonce are queued once
     operations = [30000,
-                  30000,
-                  30000,
                   40000,
                   50000,
                   60000,
@@ -183,7 +487,7 @@ test_with_different_address()
         (50000, 124),
         (60000, 124),
         (30000, 125),
-        (30000, 125),
+        (None, None),
     ]
 
     def int2hex(integ):
@@ -239,10 +543,10 @@ def test_diff():
 from ccoin.transaction_queue import *
 test_diff()
     """
-    tx1 = make_test_tx(data='a')
-    tx2 = make_test_tx(data='b')
-    tx3 = make_test_tx(data='c')
-    tx4 = make_test_tx(data='d')
+    tx1 = make_test_tx(nonce=1, data='a')
+    tx2 = make_test_tx(nonce=2, data='b')
+    tx3 = make_test_tx(nonce=3, data='c')
+    tx4 = make_test_tx(nonce=4, data='d')
     q1 = TransactionQueue()
     for tx in [tx1, tx2, tx3, tx4]:
         q1.add_transaction(tx)
@@ -255,4 +559,157 @@ test_diff()
     q3 = q2.diff([tx4])
     assert len(q3) == 2
     assert tx1 in [item.tx for item in q3.txs]
-    assert tx3 in [item.tx for item in q3.txs]
\ No newline at end of file
+    assert tx3 in [item.tx for item in q3.txs]
+
+def test_remove_many():
+    """
+from ccoin.transaction_queue import *
+test_remove_many()
+    """
+    txs = [make_test_tx(nonce=i) for i in range(5)]
+    q = TransactionQueue()
+    for tx in txs:
+        q.add_transaction(tx)
+    assert q.remove_many([txs[1].id, txs[3].id, "unknown"]) == 2
+    assert len(q) == 3
+    assert q.contains(txs[0].id)
+    assert not q.contains(txs[1].id)
+    assert [q.pop_transaction().nonce for _ in range(3)] == [0, 2, 4]
+    assert q.pop_transaction() is None
+    assert len(q) == 0
+
+
+def test_compaction():
+    """
+from ccoin.transaction_queue import *
+test_compaction()
+    """
+    txs = [make_test_tx(nonce=i) for i in range(10)]
+    q = TransactionQueue()
+    q.COMPACT_MIN_TOMBSTONES = 0
+    for tx in txs:
+        q.add_transaction(tx)
+    q.remove_many([tx.id for tx in txs[:4]])
+    assert q.tombstones == 4 and len(q.txs) == 10
+    q.remove_many([txs[4].id, txs[5].id])
+    assert q.tombstones == 0 and len(q.txs) == 4
+    assert sorted(item.tx.nonce for item in q.peek()) == [6, 7, 8, 9]
+
+
+def test_ready_transactions():
+    """
+from ccoin.transaction_queue import *
+test_ready_transactions()
+    """
+    q = TransactionQueue()
+    for nonce, sender in [(2, b'\x35'), (1, b'\x36'), (4, b'\x35'), (1, b'\x35'), (2, b'\x36'), (1, b'\x37')]:
+        assert q.add_transaction(make_test_tx(nonce=nonce, sender=sender))
+    assert not q.add_transaction(make_test_tx(nonce=1, sender=b'\x35', data='replacement'))
+    state_nonces = {"35": 0, "36": 0}
+
+    def nonce_lookup(address):
+        return state_nonces.get(address[:2])
+
+    ready = [(tx.sender[:2], tx.nonce) for tx in q.iter_ready(nonce_lookup)]
+    # senders are interleaved by arrival of their next transaction, nonce 4 waits for nonce 3,
+    # sender 37 has no account
+    assert ready == [("36", 1), ("35", 1), ("35", 2), ("36", 2)]
+    assert len(q) == 6
+
+
+def test_remove_stale():
+    """
+from ccoin.transaction_queue import *
+test_remove_stale()
+    """
+    q = TransactionQueue()
+    for nonce in range(1, 6):
+        q.add_transaction(make_test_tx(nonce=nonce))
+    address = q.txs[0].prio.address
+    assert q.remove_stale(address, 3) == 3
+    assert sorted(q.senders[address]) == [4, 5]
+    assert q.remove_stale(address, None) == 0
+    assert [q.pop_transaction().nonce for _ in range(2)] == [4, 5]
+    assert address not in q.senders
+
+
+def test_limits():
+    """
+from ccoin.transaction_queue import *
+test_limits()
+    """
+    q = TransactionQueue(max_transactions=4, max_per_sender=3)
+    for nonce in range(1, 5):
+        q.add_transaction(make_test_tx(nonce=nonce, sender=b'\x35'))
+    # sender limit rejects the 4th transaction
+    assert len(q) == 3
+    assert q.add_transaction(make_test_tx(nonce=1, sender=b'\x36'))
+    # the sender with the most pending transactions loses its highest nonce
+    assert q.add_transaction(make_test_tx(nonce=2, sender=b'\x36'))
+    assert len(q) == 4
+    assert sorted(q.senders[q.txs[0].prio.address]) == [1, 2]
+    # queued transactions don't hold their wire bytes
+    assert not any(getattr(item.tx, "_memo", None) for item in q.txs if item.tx is not None)
+    assert q.bytes == sum(len(item.tx.serialize()) for item in q.txs if item.tx is not None)
+
+    q = TransactionQueue(max_bytes=1)
+    assert not q.add_transaction(make_test_tx(nonce=1))
+    assert len(q) == 0 and q.bytes == 0 and not q.senders and not q.sender_buckets and not q.spent
+
+
+def test_spent():
+    """
+from ccoin.transaction_queue import *
+test_spent()
+    """
+    q = TransactionQueue()
+    txs = [make_test_tx(nonce=nonce, amount=10 * nonce) for nonce in range(1, 4)]
+    for tx in txs:
+        q.add_transaction(tx)
+    address = q.txs[0].prio.address
+    assert q.spent[address] == 60
+    assert q.next_transaction(address, 1) is txs[1]
+    assert q.next_transaction(address, 3) is None
+    q.remove_many([txs[1].id])
+    assert q.spent[address] == 40
+    q.remove_stale(address, 3)
+    assert address not in q.spent
+
+
+def test_expire():
+    """
+from ccoin.transaction_queue import *
+test_expire()
+    """
+    q = TransactionQueue(ttl=60)
+    txs = [make_test_tx(nonce=nonce) for nonce in range(1, 4)]
+    for tx in txs:
+        q.add_transaction(tx)
+    q.index[txs[0].id].added -= 100
+    q.index[txs[1].id].added -= 100
+    assert q.expire() == 2
+    assert len(q) == 1 and q.contains(txs[2].id)
+    assert q.expire(now=time.time() + 61) == 1
+    assert len(q) == 0
+
+
+def test_snapshot():
+    """
+from ccoin.transaction_queue import *
+test_snapshot()
+    """
+    q = TransactionQueue()
+    for nonce in range(1, 4):
+        q.add_transaction(make_test_tx(nonce=nonce))
+    snapshot = q.snapshot()
+    assert len(snapshot) == 3
+    assert [tx.nonce for tx in snapshot.iter_ready(lambda address: 0)] == [1, 2, 3]
+    # reading the snapshot doesn't change the queue
+    assert len(q) == 3 and q.generation == snapshot.generation
+    q.add_transaction(make_test_tx(nonce=4))
+    try:
+        list(snapshot.iter_ready(lambda address: 0))
+    except TransactionQueueChanged:
+        pass
+    else:
+        assert False, "Changed queue should invalidate the snapshot"
@@ -1,19 +1,25 @@
 import plyvel
 import json
 import os
-from ccoin.accounts import Account
 from ccoin.exceptions import TransactionBadNonce, TransactionSenderIsOutOfCoins, SenderStateDoesNotExist
 from ccoin.messages import Transaction
-from ccoin.security import hash_message
+from ccoin.security import hash_message, verify_many, public_key_address, to_address, DEFAULT_SIGNATURE_SCHEME
 from ccoin.utils import ensure_dir
 
 
 class AccountState(object):
 
-    def __init__(self, address, nonce=0, balance=0):
+    __slots__ = ("address", "nonce", "balance", "public_key")
+
+    def __init__(self, address, nonce=0, balance=0, public_key=None):
+        """
+        :param public_key: hex-encoded public key introduced by account's first applied transaction
+        :type public_key: str
+        """
         self.address = address
         self.nonce = nonce
         self.balance = balance
+        self.public_key = public_key
 
     @classmethod
     def deserialize(cls, bytes):
@@ -42,11 +48,15 @@ class AccountState(object):
         :return: dict representation
         :rtype: dict[any]
         """
-        return {
+        data = {
             "address": self.address,
             "nonce": self.nonce,
             "balance": self.balance
         }
+        if self.public_key is not None:
+            # accounts without registered key keep their original encoding
+            data["public_key"] = self.public_key
+        return data
 
     @classmethod
     def from_dict(self, data):
@@ -68,11 +78,69 @@ class AccountState(object):
         return json.loads(json_data)
 
 
+class PendingState(object):
+    """Overlay of the world state with effects of transactions pending in the transaction queue.
+
+    Sender's pending nonce is the end of the contiguous run of sender's queued transactions right after
+    sender's nonce in the world state. Sender's remaining balance is the balance in the world state less
+    the amount of all sender's queued transactions, incoming pending transfers aren't taken into account.
+    Transactions which can't be applied on top of the overlay are doomed and aren't worth queueing.
+    """
+
+    def __init__(self, worldstate, txqueue):
+        """
+        :param worldstate: state of the chain head
+        :type worldstate: WorldState
+        :param txqueue: transaction queue
+        :type txqueue: ccoin.transaction_queue.TransactionQueue
+        """
+        self.worldstate = worldstate
+        self.txqueue = txqueue
+
+    def pending_nonce(self, account_addr):
+        """
+        :param account_addr: account address
+        :type account_addr: str
+        :return: nonce of the account once its ready transactions are applied, None if account doesn't exist
+        :rtype: int
+        """
+        nonce = self.worldstate.account_nonce(account_addr)
+        if nonce is None:
+            return
+        while self.txqueue.next_transaction(account_addr, nonce) is not None:
+            nonce += 1
+        return nonce
+
+    def remaining_balance(self, account_addr):
+        """
+        :param account_addr: account address
+        :type account_addr: str
+        :return: balance of the account once its queued transactions are applied, None if account doesn't exist
+        :rtype: int
+        """
+        account_state = self.worldstate.account_state(account_addr)
+        if account_state is None:
+            return
+        return account_state.balance - self.txqueue.spent.get(account_addr, 0)
+
+    def check(self, transaction):
+        """
+        Checks transaction can be applied on top of pending transactions.
+        :param transaction: transaction
+        :type transaction: ccoin.messages.Transaction
+        :raises: TransactionApplyException
+        """
+        sender_state = self.worldstate.account_state(transaction.sender_address)
+        if not sender_state or not (transaction.nonce > sender_state.nonce):
+            raise TransactionBadNonce(transaction)
+        if self.remaining_balance(transaction.sender_address) - (transaction.amount or 0) < 0:
+            raise TransactionSenderIsOutOfCoins(transaction)
+
+
 class WorldState(object):
 
     SPECIAL_KEYS = (b"hash_state",)
 
-
     @classmethod
     def load(cls, storage_path, db_name, block_height):
         """
@@ -107,6 +175,52 @@ class WorldState(object):
     def to_key(block_number, account_addr):
         return ("worldstate.blk-%s:account-%s" % (block_number, account_addr)).encode()
 
+    def public_key(self, account_addr, block_number=None):
+        """
+        Returns hex-encoded public key registered for the account address.
+        :param account_addr:
+        :param block_number: block whose committed state is looked up, the current state by default
+        :type block_number: int
+        :return: public key or None if it is not registered yet
+        :rtype: str|None
+        """
+        if block_number is None or block_number == self.height:
+            account_state = self.account_state(account_addr)
+        else:
+            account_bytes = self.db.get(self.to_key(block_number, account_addr))
+            account_state = AccountState.deserialize(account_bytes) if account_bytes is not None else None
+        if account_state is None:
+            return None
+        return account_state.public_key
+
+    def register_public_key(self, public_key):
+        """
+        Stores sender's public key once, so that later transactions can reference sender by address.
+        The key is the part of account state: it is committed with the block, rolled back with it
+        and covered by the state hash.
+        :param public_key: hex-encoded public key whose signature has been verified
+        :type public_key: str
+        """
+        account_state = self.account_state(public_key_address(public_key))
+        if account_state is not None and account_state.public_key is None:
+            account_state.public_key = public_key
+
+    def resolve_sender_keys(self, txn_list):
+        """
+        Attaches registered public keys to address-referenced transactions.
+        Keys introduced by preceding transactions of the list are taken into account.
+        :param txn_list: list of transactions
+        :type txn_list: list[ccoin.messages.Transaction]
+        """
+        introduced = {}
+        for txn in txn_list:
+            if not txn.sender_is_address:
+                introduced.setdefault(txn.sender_address, txn.sender)
+            elif txn.sender_public_key is None:
+                public_key = introduced.get(txn.sender) or self.public_key(txn.sender)
+                if public_key is not None:
+                    txn.set_sender_public_key(public_key)
+
     def from_genesis_block(self, genesis_block, commit=True):
         """Creates/Initializes state from genesis block."""
         genesis_config = genesis_block.loaded_data
@@ -150,6 +264,8 @@ class WorldState(object):
         invalid_block_height = self.height
         self.move_cursor(move_to_block_height)
         self.clear_block(invalid_block_height)
+        # cached accounts hold changes of the invalid block
+        self.cache = {}
         return invalid_block_height
 
     def clear_block(self, block_height):
@@ -209,6 +325,18 @@ class WorldState(object):
                 self.cache[account_addr] = AccountState(account_addr)
         return self.cache.get(account_addr, None)
 
+    def account_nonce(self, account_addr):
+        """
+        :param account_addr: account address
+        :type account_addr: str
+        :return: account's nonce, None if account doesn't exist
+        :rtype: int
+        """
+        account_state = self.account_state(account_addr)
+        if account_state is None:
+            return
+        return account_state.nonce
+
     def set_state_hash(self, hash_state):
         self.hash_state = hash_state
         self.db.put(b"hash_state", self.hash_state.encode())
@@ -224,23 +352,23 @@ class WorldState(object):
         concat_bytes = b"|".join(concat)
         return hash_message(concat_bytes)
 
-    def make_txn(self, from_, to, data=None, amount=None, nonce=0):
+    def make_txn(self, from_, to, data=None, amount=None, nonce=0, scheme=DEFAULT_SIGNATURE_SCHEME):
         """
         :param command: command details
         :type command: str
-        :param from_: sender public key
+        :param from_: sender public key or address if sender's public key is registered
         :type from_: str
-        :param to: recipient public key
+        :param to: recipient public key or address
         :param amount: amount of money to send to
+        :param scheme: signature scheme of sender's keys
         :return: transaction reference
         :rtype: Transaction
         """
         # TODO move to commons.py
-        sender = Account(from_)
-        sender_state = self.account_state(sender.address)
+        sender_state = self.account_state(to_address(from_))
         if sender_state is None:
             raise SenderStateDoesNotExist(from_)
-        txn = Transaction(nonce, from_, to=to, amount=amount, data=data)
+        txn = Transaction(nonce, from_, to=to, amount=amount, data=data, scheme=scheme)
         return txn
 
     def set_balance(self, addr, balance):
@@ -276,19 +404,29 @@ class WorldState(object):
         :raises: TransactionApplyException
         """
         # TODO wrap in LEVELDB transaction
-        for txn in txn_list:
-            self.apply_txn(txn)
-
-    def apply_txn(self, transaction):
+        # signatures are verified in parallel up front, then transactions are applied sequentially
+        self.resolve_sender_keys(txn_list)
+        for txn, error in zip(txn_list, verify_many(txn_list)):
+            if error is not None:
+                raise error
+            self.apply_txn(txn, verify=False)
+
+    def apply_txn(self, transaction, verify=True, commit=True):
         """
         Changes the state by applying transaction
         :param transaction:
         :type transaction: ccoin.messages.Transaction
+        :param verify: whether to verify transaction signature, False if it is already verified
+        :type verify: bool
+        :param commit: whether to commit the state, False if the caller commits once after many transactions
+        :type commit: bool
         :raises: TransactionApplyException
         """
         # check transaction is well-formed: the signature is valid, and the nonce matches the nonce
         # in the sender's account. If not, return an error
-        transaction.verify()
+        if verify:
+            self.resolve_sender_keys([transaction])
+            transaction.verify()
         # Check nonce matches the sender's account
         sender_state = self.account_state(transaction.sender_address)
         recipient_state = self.account_state(transaction.recipient_address, create=True)
@@ -301,5 +439,8 @@ class WorldState(object):
         self.set_nonce(sender_state.address, transaction.nonce)
         self.incr_balance(sender_state.address, -1 * transaction.amount)
         self.incr_balance(recipient_state.address, transaction.amount)
+        if not transaction.sender_is_address:
+            self.register_public_key(transaction.sender)
         # Debig/Credit
-        self.commit()
+        if commit:
+            self.commit()
@@ -12,13 +12,14 @@ class Options(usage.Options):
 
     optParameters = [
         ['config', 'c', 'ccoin.json', 'Application config file'],
+        ['scheme', 's', 'rsa', 'Signature scheme of account keys: rsa or ed25519'],
     ]
 
 
 @defer.inlineCallbacks
-def create_account():
+def create_account(scheme):
     """Generates public/private keys under the specified path"""
-    account = yield defer.maybeDeferred(Account.create)
+    account = yield defer.maybeDeferred(Account.create, scheme=scheme)
     log.msg("Created account with address=%s" % account.address)
 
 
@@ -30,7 +31,7 @@ class CreateAccountServiceMaker(Configurable):
 
     def makeService(self, options):
         self.configure(options)
-        return ExecuteAndForgetService(create_account)
+        return ExecuteAndForgetService(create_account, options["scheme"])
 
 
 service_maker = CreateAccountServiceMaker()